@@ -0,0 +1,149 @@
+import argparse
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import time
+from collections import deque
+from inline import run
+from lexer_table import load_lexer_table
+from metrics import peak_rss_kb
+from tokenizer import Tokenizer
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+def load_manifest(path):
+    ''' Reads the jobs of a batch from the manifest at path: a JSON list of jobs, or one JSON
+        job per line. A job is an object with the fields:
+            input (str or List of str) : the input files, as given to inline.py
+            output (str) : the output file
+            tops (List of str) : the top modules, optional
+            timeout (float), memory_mb (int) : optional limits overriding those of the batch
+        Returns: List of dict
+        Raises: ValueError if a job lacks its input or its output
+    '''
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        jobs = json.loads(text)
+    else:
+        jobs = [json.loads(line) for line in text.splitlines() if line.strip()]
+    for i, job in enumerate(jobs):
+        if not isinstance(job, dict) or "input" not in job or "output" not in job:
+            raise ValueError(f"Job {i} of manifest {path} lacks an input or an output in function batch.load_manifest\nCheck the manifest for one object with an \"input\" and an \"output\" per job")
+    return jobs
+
+def run_batch(config_path, jobs, workers=None, timeout=None, memory_mb=None, lexer="char", compact=False, cache_dir=None, callback=None):
+    ''' Runs the inlining jobs (List of dict, see load_manifest) of a batch, each in its own
+        process, at most workers (default: the number of CPUs) at a time. The processes are
+        forked from this one once the inliner and the configuration are loaded, so a job
+        does not pay for starting an interpreter. A job running longer than timeout seconds
+        is killed, and memory_mb limits the address space of each job process.
+        Params:
+            config_path, lexer, compact, cache_dir : see Inliner
+            callback (function dict -> None) : called with the result of each job as soon as
+                it completes
+        Returns: the summary of the batch (dict): the number of jobs, of "ok" and "failed"
+            ones, the wall "seconds" of the batch, and the "results" of the jobs in the order
+            of the manifest. A result holds the "index", "input" and "output" of its job, its
+            "status" ("ok", "error", "timeout", "memory" or "crashed"), its wall "seconds", the
+            "peak_rss_kb" of its process and, unless it succeeded, an "error" message.
+    '''
+    if memory_mb and resource is None:
+        print("WARNING: memory limits are not supported on this platform and are ignored")
+    # Loaded once here and inherited by every job process
+    load_lexer_table(config_path)
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    workers = workers or os.cpu_count() or 1
+    settings = (lexer, compact, cache_dir)
+    start = time.perf_counter()
+    queue = deque(enumerate(jobs))
+    running = {} # Maps the index of each running job to its process, connection, start time and deadline
+    results = [None] * len(jobs)
+    def finish(index, result):
+        job = jobs[index]
+        result.update(index=index, input=job["input"], output=job["output"])
+        results[index] = result
+        if callback:
+            callback(result)
+    while(queue or running):
+        while(queue and len(running) < workers):
+            index, job = queue.popleft()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_job_worker, args=(sender, config_path, job, settings, job.get("memory_mb", memory_mb)), daemon=True)
+            process.start()
+            sender.close()
+            job_timeout = job.get("timeout", timeout)
+            deadline = time.perf_counter() + job_timeout if job_timeout else None
+            running[index] = (process, receiver, time.perf_counter(), deadline)
+        deadlines = [x[3] for x in running.values() if x[3] is not None]
+        wait = max(0, min(deadlines) - time.perf_counter()) if deadlines else None
+        multiprocessing.connection.wait([x[1] for x in running.values()] + [x[0].sentinel for x in running.values()], wait)
+        now = time.perf_counter()
+        for index, (process, receiver, started, deadline) in list(running.items()):
+            if receiver.poll():
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    # The process died without sending its result
+                    process.join()
+                    result = {"status": "crashed", "error": f"Job process exited with code {process.exitcode}", "seconds": now - started, "peak_rss_kb": None}
+            elif deadline is not None and now >= deadline:
+                process.kill()
+                result = {"status": "timeout", "error": f"Job killed after {now - started:.1f} seconds", "seconds": now - started, "peak_rss_kb": None}
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del running[index]
+            finish(index, result)
+    failed = sum(x["status"] != "ok" for x in results)
+    return {"jobs": len(jobs), "ok": len(jobs) - failed, "failed": failed, "seconds": time.perf_counter() - start, "results": results}
+
+def _job_worker(sender, config_path, job, settings, memory_mb):
+    ''' Runs one job in a job process, and sends its result (see run_batch) through sender '''
+    if memory_mb and resource is not None:
+        limit = memory_mb * 2 ** 20
+        resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+    # The progress messages of run() would interleave with those of the other jobs
+    sys.stdout = open(os.devnull, "w")
+    start = time.perf_counter()
+    result = {"status": "ok"}
+    try:
+        run(config_path, job["input"], job["output"], job.get("tops"), *settings)
+    except MemoryError:
+        result = {"status": "memory", "error": f"Job exceeded its memory limit of {memory_mb} MB"}
+    except Exception as e:
+        result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    result["seconds"] = time.perf_counter() - start
+    result["peak_rss_kb"] = peak_rss_kb()
+    sender.send(result)
+    sender.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inlines the independent designs listed in a manifest concurrently")
+    parser.add_argument("manifest", help="a JSON file listing the jobs, or holding one JSON job per line; each job has an \"input\", an \"output\" and optionally \"tops\"")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, help="the number of jobs run at the same time (default: the number of CPUs)")
+    parser.add_argument("--timeout", type=float, help="seconds after which a job is killed")
+    parser.add_argument("--memory", type=int, help="the memory limit of each job, in MB")
+    parser.add_argument("-l", "--lexer", choices=Tokenizer.engines, default="char", help="the lexer engine used to tokenize the input (default: %(default)s)")
+    parser.add_argument("--compact", action="store_true", help="store the tokens of the indexed modules in compact token tables")
+    parser.add_argument("--cache-dir", help="a directory in which inlined modules are cached between runs, shared by the jobs")
+    parser.add_argument("--summary", help="a JSON file in which to write the summary of the batch, with the timing of each job")
+    args = parser.parse_args()
+    jobs = load_manifest(args.manifest)
+    def report(result):
+        print(json.dumps(result), flush=True)
+    summary = run_batch(args.config, jobs, args.workers, args.timeout, args.memory, args.lexer, args.compact, args.cache_dir, report)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=4)
+    print(f"{summary['ok']} of {summary['jobs']} jobs succeeded in {summary['seconds']:.2f} seconds", file=sys.stderr)
+    sys.exit(1 if summary["failed"] else 0)
@@ -0,0 +1,56 @@
+''' Benchmark of the throughput of batch.py against separate inline.py invocations.
+    Generates many small independent designs and inlines all of them three ways: one
+    inline.py process per design, run one after the other; batch.py with a single worker,
+    which only saves the interpreter and configuration startup of every job; and batch.py
+    with several workers. Reports the wall time and the designs per second of each.
+
+    Usage: python benchmarks/bench_batch.py [-c config.json] [--designs 100] [--workers 4]
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import generate_design
+
+def write_designs(directory, designs):
+    ''' Writes the designs and the manifest of a batch inlining them; returns the manifest path '''
+    jobs = []
+    for i in range(designs):
+        path = os.path.join(directory, f"design{i}.v")
+        with open(path, "w") as f:
+            f.write(generate_design(depth=2, fanout=3, statements=10, seed=i))
+        jobs.append({"input": path, "output": os.path.join(directory, f"design{i}.out.v"), "tops": ["m0"]})
+    manifest = os.path.join(directory, "manifest.json")
+    with open(manifest, "w") as f:
+        json.dump(jobs, f)
+    return manifest, jobs
+
+def timed(command):
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=ROOT)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the throughput of batch.py with separate inline.py invocations")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("--designs", type=int, default=100, help="number of designs to inline (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=4, help="workers of the parallel batch (default: %(default)s)")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest, jobs = write_designs(tmp, args.designs)
+        separate = 0.0
+        for job in jobs:
+            separate += timed([sys.executable, "-W", "ignore", "inline.py", "-c", args.config, "-t", "m0", "-o", job["output"], job["input"]])
+        single = timed([sys.executable, "-W", "ignore", "batch.py", "-c", args.config, "-w", "1", manifest])
+        parallel = timed([sys.executable, "-W", "ignore", "batch.py", "-c", args.config, "-w", str(args.workers), manifest])
+    print(f"{'mode':>24} {'seconds':>9} {'designs/s':>10}")
+    for mode, seconds in (("inline.py per design", separate), ("batch.py -w 1", single), (f"batch.py -w {args.workers}", parallel)):
+        print(f"{mode:>24} {seconds:>9.2f} {args.designs / seconds:>10.1f}")
@@ -0,0 +1,62 @@
+''' Benchmark of the parsing of the connection lists of module instantiations.
+    Generates the instantiation of a module with many ports, with a named or a
+    positional port list whose connections are plain nets or expressions (bit selects,
+    concatenations and nested parentheses), and reports the time Inliner._parse_instantiation
+    spends on it, lexing excluded. The lists are parsed in a single pass by
+    connections.parse_connections, so the time per connection stays roughly constant
+    as the lists grow.
+
+    Usage: python benchmarks/bench_connections.py [-c config.json] [--entries 1000 10000]
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inliner import Inliner
+from tokenizer import Tokenizer
+
+STYLES = ("named", "positional", "named expressions", "positional expressions")
+
+def connection(i, expressions):
+    if expressions:
+        return f"{{a[{i}], b[{i % 8}:0]}} & (c[{i}] | (d >> {i % 4}))"
+    return f"w{i}"
+
+def instantiation(entries, style):
+    ''' Returns the text (str) of an instantiation of module wide with entries connections '''
+    expressions = style.endswith("expressions")
+    if style.startswith("named"):
+        ports = ",\n    ".join(f".p{i}({connection(i, expressions)})" for i in range(entries))
+    else:
+        ports = ",\n    ".join(connection(i, expressions) for i in range(entries))
+    return f"wide #(.W(8)) u0 (\n    {ports}\n);"
+
+def time_parse(config_path, path, entries, style):
+    inliner = Inliner(config_path, path)
+    inliner._index()
+    tokens = Tokenizer(config_path).tokenize(instantiation(entries, style))
+    start = time.perf_counter()
+    ports = inliner._parse_instantiation(tokens)[3]
+    return len(ports), time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the parsing of instantiations with growing connection lists")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("--entries", nargs="+", type=int, default=[1000, 10000], help="numbers of connections to generate (default: %(default)s)")
+    parser.add_argument("--styles", nargs="+", choices=STYLES, default=STYLES, help="port list styles to time (default: all)")
+    args = parser.parse_args()
+    print(f"{'style':>22} {'entries':>8} {'bound':>8} {'seconds':>9} {'us/entry':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for entries in args.entries:
+            path = os.path.join(tmp, f"wide_{entries}.v")
+            with open(path, "w") as f:
+                f.write(f"module wide({', '.join(f'p{i}' for i in range(entries))});\n    parameter W = 4;\n")
+                f.write("".join(f"    input p{i};\n" for i in range(entries)))
+                f.write("endmodule\n")
+            for style in args.styles:
+                bound, elapsed = time_parse(args.config, path, entries, style)
+                print(f"{style:>22} {entries:>8} {bound:>8} {elapsed:>9.3f} {elapsed / entries * 1e6:>9.2f}")
@@ -0,0 +1,56 @@
+''' Benchmark of the indexing of designs split across many files.
+    Generates a directory holding one small module per file and reports the time
+    Inliner._index spends reading it, with one process and with a pool of worker
+    processes.
+
+    Usage: python benchmarks/bench_files.py [-c config.json] [--files 1000 4000] [--jobs 1 4]
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inliner import Inliner
+
+MODULE_TEMPLATE = '''// synthetic module {i}
+module leaf_{i}(clk, a, b, y);
+    input clk;
+    input [7:0] a, b;
+    output reg [7:0] y;
+    /* registered sum */
+    always @(posedge clk) y <= a + b;
+endmodule
+'''
+
+def write_design(directory, files):
+    for i in range(files):
+        # Spread the files over subdirectories, as in a source tree
+        subdirectory = os.path.join(directory, f"block_{i // 100}")
+        os.makedirs(subdirectory, exist_ok=True)
+        with open(os.path.join(subdirectory, f"leaf_{i}.v"), 'w') as f:
+            f.write(MODULE_TEMPLATE.format(i=i))
+
+def time_index(config_path, directory, lexer, jobs):
+    inliner = Inliner(config_path, directory, lexer)
+    start = time.perf_counter()
+    inliner._index(jobs)
+    elapsed = time.perf_counter() - start
+    return len(inliner.modules), elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times Inliner._index on directories of growing numbers of files")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("-l", "--lexer", default="regex", help="the lexer engine (default: %(default)s)")
+    parser.add_argument("--files", nargs="+", type=int, default=[1000, 4000], help="numbers of files to generate (default: %(default)s)")
+    parser.add_argument("--jobs", nargs="+", type=int, default=[1, 4], help="numbers of processes to index with (default: %(default)s)")
+    args = parser.parse_args()
+    print(f"{'files':>8} {'jobs':>5} {'seconds':>9} {'ms/file':>8}")
+    for files in args.files:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_design(tmp, files)
+            for jobs in args.jobs:
+                modules, elapsed = time_index(args.config, tmp, args.lexer, jobs)
+                print(f"{modules:>8} {jobs:>5} {elapsed:>9.3f} {elapsed / files * 1e3:>8.2f}")
@@ -0,0 +1,70 @@
+''' Benchmark of module instantiation in Inliner._inline.
+    Generates a top module instantiating the same child module many times and
+    reports the time spent inlining the top module, and the number of memory blocks
+    the inlined modules hold on to afterwards. The child is analysed once, so the
+    time per instance stays roughly constant as the number of instances grows.
+
+    Usage: python benchmarks/bench_instances.py [-c config.json] [--instances 1000 10000]
+'''
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inliner import Inliner
+
+CHILD = '''module child(clk, rst_n, a, b, y, v);
+    parameter W = 8;
+    input clk; // clock
+    input rst_n;
+    input [W-1:0] a, b;
+    output reg [W-1:0] y;
+    output v;
+    wire [W-1:0] s;
+    /* combinational part */
+    assign s = a + b;
+    assign v = ^s;
+    always @(posedge clk or negedge rst_n)
+        if (!rst_n) y <= 0;
+        else y <= s;
+endmodule
+
+'''
+
+def write_design(path, instances):
+    with open(path, 'w') as f:
+        f.write(CHILD)
+        f.write("module top(clk, rst_n, a, b, y, v);\n    input clk, rst_n;\n    input [7:0] a, b;\n")
+        f.write("    output [7:0] y;\n    output v;\n")
+        for i in range(instances):
+            f.write(f"    child u{i} (.clk(clk), .rst_n(rst_n), .a(a), .b(b), .y(y), .v(v));\n")
+        f.write("endmodule\n")
+
+def time_inline(config_path, path):
+    inliner = Inliner(config_path, path)
+    inliner._index()
+    inliner._generate_reference_tree()
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    inliner._inline()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    return elapsed, sys.getallocatedblocks() - blocks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times Inliner._inline on a module with a growing number of instances")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("--instances", nargs="+", type=int, default=[1000, 10000], help="numbers of instances to generate (default: %(default)s)")
+    args = parser.parse_args()
+    print(f"{'instances':>10} {'seconds':>9} {'us/instance':>12} {'blocks/instance':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for instances in args.instances:
+            path = os.path.join(tmp, f"design_{instances}.v")
+            write_design(path, instances)
+            elapsed, blocks = time_inline(args.config, path)
+            print(f"{instances:>10} {elapsed:>9.3f} {elapsed / instances * 1e6:>12.1f} {blocks / instances:>16.1f}")
@@ -0,0 +1,50 @@
+''' Benchmark comparing the throughput of the Tokenizer engines, and of
+    Tokenizer.tokenize_bytes, which lexes UTF-8 text in place for --mmap.
+    The input is the test corpus (sample.vl) repeated until it reaches the
+    requested size.
+
+    Usage: python benchmarks/bench_lexer.py [-c config.json] [--corpus sample.vl] [--kilobytes 2048]
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tokenizer import Tokenizer
+
+def time_engine(config_path, engine, text):
+    tokenizer = Tokenizer(config_path, engine)
+    start = time.perf_counter()
+    count = 0
+    for _ in tokenizer.tokenize_stream((text,)):
+        count += 1
+    return count, time.perf_counter() - start
+
+def time_bytes(config_path, data):
+    tokenizer = Tokenizer(config_path)
+    start = time.perf_counter()
+    count = len(tokenizer.tokenize_bytes(data))
+    return count, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the throughput of the Tokenizer engines")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("--corpus", default="sample.vl", help="the Verilog text to repeat (default: %(default)s)")
+    parser.add_argument("--kilobytes", type=int, default=2048, help="size of the generated input (default: %(default)s)")
+    args = parser.parse_args()
+    with open(args.corpus) as f:
+        corpus = f.read()
+    text = corpus * max(1, args.kilobytes * 1024 // len(corpus))
+    results = {}
+    print(f"{'engine':>8} {'tokens':>10} {'seconds':>9} {'MB/s':>7}")
+    for engine in Tokenizer.engines:
+        count, elapsed = time_engine(args.config, engine, text)
+        results[engine] = elapsed
+        print(f"{engine:>8} {count:>10} {elapsed:>9.3f} {len(text) / elapsed / 1e6:>7.2f}")
+    count, elapsed = time_bytes(args.config, text.encode("utf-8"))
+    results["bytes"] = elapsed
+    print(f"{'bytes':>8} {count:>10} {elapsed:>9.3f} {len(text) / elapsed / 1e6:>7.2f}")
+    print(f"speedup of regex over char: {results['char'] / results['regex']:.1f}x")
+    print(f"speedup of tokenize_bytes over char: {results['char'] / results['bytes']:.1f}x")
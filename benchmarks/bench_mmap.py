@@ -0,0 +1,58 @@
+''' Benchmark of the peak memory of Inliner._index on a large gate-level netlist.
+    Generates a flat netlist of many cell instances and indexes it in a fresh process
+    for each input mode: token lists, compact token tables over the text of the file,
+    and compact token tables over the memory-mapped file (--mmap). Reports the time
+    spent and the peak resident set size of each process.
+
+    Usage: python benchmarks/bench_mmap.py [-c config.json] [--cells 200000]
+'''
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inliner import Inliner
+
+MODES = {"lists": {}, "compact": {"compact": True}, "mmap": {"mapped": True}}
+
+def write_netlist(path, cells):
+    with open(path, 'w') as f:
+        for name in ("NAND2", "NOR2"):
+            f.write(f"module {name}(A, B, Y);\n    input A, B;\n    output Y;\n    assign Y = A;\nendmodule\n\n")
+        f.write("module netlist(clk, n0);\n    input clk;\n    output n0;\n")
+        for i in range(cells):
+            f.write(f"    wire n{i + 1};\n    NAND2 g{i} (.A(n{i + 1}), .B(clk), .Y(n{i}));\n")
+        f.write("endmodule\n")
+
+def index(config_path, path, mode):
+    ''' Runs in the child process; prints the seconds spent and the peak RSS in MB '''
+    inliner = Inliner(config_path, path, "regex", **MODES[mode])
+    start = time.perf_counter()
+    inliner._index()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # kB on Linux
+    print(elapsed, peak)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the peak memory of Inliner._index in each input mode")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("--cells", type=int, default=200000, help="number of cell instances in the netlist (default: %(default)s)")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        index(args.config, *args.child)
+        sys.exit()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "netlist.v")
+        write_netlist(path, args.cells)
+        print(f"netlist: {os.path.getsize(path) / 2 ** 20:.1f} MB")
+        print(f"{'mode':>8} {'seconds':>9} {'peak MB':>8}")
+        for mode in MODES:
+            output = subprocess.run([sys.executable, "-W", "ignore", __file__, "-c", args.config, "--child", path, mode],
+                capture_output=True, text=True, check=True).stdout.split()
+            print(f"{mode:>8} {float(output[-2]):>9.3f} {float(output[-1]):>8.1f}")
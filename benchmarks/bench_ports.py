@@ -0,0 +1,56 @@
+''' Benchmark of the module parsing done by Inliner._build_module.
+    Generates modules with very large port lists, in both the non-ANSI style
+    (names in the header, declarations in the body) and the ANSI style
+    (declarations with ranges in the header), and reports the time spent
+    building the Module from the tokens of each one, lexing excluded. The module is
+    parsed in a single pass, so the time per port stays roughly constant as the
+    port list grows.
+
+    Usage: python benchmarks/bench_ports.py [-c config.json] [--ports 5000 20000 80000]
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inliner import Inliner
+
+def write_design(path, ports, ansi):
+    with open(path, 'w') as f:
+        if ansi:
+            f.write("module wide #(parameter W = 8, parameter [3:0] D = 2) (\n")
+            f.write(",\n".join(f"    input wire [W-1:0] p{i}" for i in range(ports)))
+            f.write(",\n    output reg [W-1:0] y\n);\n")
+        else:
+            f.write("module wide(\n")
+            f.write(",\n".join(f"    p{i}" for i in range(ports)))
+            f.write(",\n    y\n);\n    parameter W = 8;\n")
+            for i in range(ports):
+                f.write(f"    input [W-1:0] p{i};\n")
+            f.write("    output reg [W-1:0] y;\n")
+        f.write("    always @(*) y = p0;\nendmodule\n")
+
+def time_build(config_path, path):
+    inliner = Inliner(config_path, path)
+    tokens = list(inliner._token_generator(path))
+    start = time.perf_counter()
+    inliner._build_module(tokens)
+    elapsed = time.perf_counter() - start
+    return len(inliner.modules["wide"].ports), elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times Inliner._build_module on modules with growing port lists")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("--ports", nargs="+", type=int, default=[5000, 20000, 80000], help="numbers of ports to generate (default: %(default)s)")
+    args = parser.parse_args()
+    print(f"{'style':>8} {'ports':>8} {'seconds':>9} {'us/port':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for ansi in (False, True):
+            for ports in args.ports:
+                path = os.path.join(tmp, f"design_{ports}.v")
+                write_design(path, ports, ansi)
+                found, elapsed = time_build(args.config, path)
+                print(f"{'ansi' if ansi else 'non-ansi':>8} {found:>8} {elapsed:>9.3f} {elapsed / found * 1e6:>9.2f}")
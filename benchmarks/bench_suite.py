@@ -0,0 +1,176 @@
+''' Benchmark suite timing and memory-profiling every phase of the inliner.
+    Generates a synthetic hierarchical design, then runs each phase on it:
+    Tokenizer.tokenize, Inliner._index, Inliner._generate_reference_tree,
+    Inliner._inline, and the output writing of inline.run. Each phase is timed in
+    a first series of runs, and profiled with tracemalloc in a separate one, so the
+    profiling does not slow down the timings. The results can be saved as JSON, and
+    two saved runs compared to flag the phases which regressed.
+
+    The generator knobs are the hierarchy depth, the fan-out (instances per module),
+    the module size (filler statements per module), named or positional port lists,
+    parameter overrides on the instances, and the comment density.
+
+    Usage: python benchmarks/bench_suite.py [-c config.json] [--depth 4] [--fanout 4] [--statements 20]
+               [--positional] [--overrides] [--comments 0.3] [--repeat 3] [-o results.json]
+           python benchmarks/bench_suite.py --compare old.json new.json [--threshold 0.1]
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inliner import Inliner
+from inline import write_module
+from tokenizer import Tokenizer
+
+PHASES = ("tokenize", "index", "reference_tree", "inline", "write")
+
+def generate_design(depth=4, fanout=4, statements=20, named=True, overrides=False, comments=0.3, seed=0):
+    ''' Returns the text (str) of a synthetic design. Module m0 instantiates fanout copies
+        of m1, which instantiates fanout copies of m2, and so on down to the leaf module
+        m<depth>, so the flattened design holds fanout ** depth leaves. Every module also
+        holds statements filler statements, a fraction comments of which carry a comment.
+    '''
+    rng = random.Random(seed)
+    def comment(text):
+        if rng.random() >= comments:
+            return ""
+        return f" // {text}" if rng.random() < 0.5 else f" /* {text} */"
+    modules = []
+    for level in range(depth, -1, -1):
+        lines = [f"module m{level}(clk, d, q);", "    parameter W = 8;", "    input clk;" + comment("clock"),
+            "    input [W-1:0] d;" + comment("data in")]
+        lines.append("    output reg [W-1:0] q;" if level == depth else "    output [W-1:0] q;")
+        for k in range(statements):
+            previous = f"s{k - 1}" if k else "d"
+            lines.append(f"    wire [W-1:0] s{k};" + comment(f"stage {k}"))
+            lines.append(f"    assign s{k} = {previous} ^ (d << {k % 8});")
+        result = f"s{statements - 1}" if statements else "d"
+        if level == depth:
+            lines.append(f"    always @(posedge clk) q <= {result};")
+        else:
+            lines.extend(f"    wire [W-1:0] w{k};" for k in range(fanout + 1))
+            lines.append(f"    assign w0 = {result};")
+            for k in range(fanout):
+                parameters = ""
+                if overrides:
+                    parameters = " #(.W(8))" if named else " #(8)"
+                if named:
+                    ports = f".clk(clk), .d(w{k}), .q(w{k + 1})"
+                else:
+                    ports = f"clk, w{k}, w{k + 1}"
+                lines.append(f"    m{level + 1}{parameters} u{k} ({ports});" + comment(f"instance {k}"))
+            lines.append(f"    assign q = w{fanout};")
+        lines.append("endmodule")
+        modules.append("\n".join(lines) + "\n")
+    return "\n".join(modules)
+
+def run_phases(config_path, path, lexer, compact, measure):
+    ''' Runs every phase once on the design at path, calling measure(name, function) to
+        run each of them, and returns the number of tokens of the design '''
+    with open(path) as f:
+        text = f.read()
+    tokenizer = Tokenizer(config_path, lexer)
+    tokens = measure("tokenize", lambda: len(tokenizer.tokenize(text)))
+    inliner = Inliner(config_path, path, lexer, compact)
+    measure("index", inliner._index)
+    measure("reference_tree", inliner._generate_reference_tree)
+    measure("inline", inliner._inline)
+    def write():
+        with open(path + ".out", "w") as f:
+            for mod in inliner._inlined_modules.values():
+                write_module(f, mod)
+    measure("write", write)
+    return tokens
+
+def profile(config_path, path, lexer, compact, repeat):
+    ''' Returns the results (dict) of every phase: the fastest of repeat timed runs, and the
+        peak and retained memory of one run under tracemalloc '''
+    results = {name: {"seconds": float("inf")} for name in PHASES}
+    def timed(name, function):
+        start = time.perf_counter()
+        value = function()
+        results[name]["seconds"] = min(results[name]["seconds"], time.perf_counter() - start)
+        return value
+    def traced(name, function):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        value = function()
+        current, peak = tracemalloc.get_traced_memory()
+        results[name]["peak_kb"] = (peak - before) / 1024
+        results[name]["retained_kb"] = (current - before) / 1024
+        return value
+    for _ in range(repeat):
+        tokens = run_phases(config_path, path, lexer, compact, timed)
+    tracemalloc.start()
+    try:
+        run_phases(config_path, path, lexer, compact, traced)
+    finally:
+        tracemalloc.stop()
+    return tokens, results
+
+def compare(old, new, threshold):
+    ''' Prints the phases of two saved runs side by side, and returns the list of the
+        (phase, metric) pairs of new which exceed those of old by more than threshold '''
+    if old["knobs"] != new["knobs"]:
+        print("WARNING: the runs were made with different knobs; the comparison may not be meaningful")
+    regressions = []
+    print(f"{'phase':>15} {'metric':>12} {'old':>12} {'new':>12} {'change':>8}")
+    for name in PHASES:
+        for metric in ("seconds", "peak_kb"):
+            before = old["phases"][name][metric]
+            after = new["phases"][name][metric]
+            change = (after - before) / before if before > 0 else 0.0
+            flag = ""
+            if change > threshold:
+                regressions.append((name, metric))
+                flag = "  REGRESSION"
+            print(f"{name:>15} {metric:>12} {before:>12.4f} {after:>12.4f} {change:>+8.1%}{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times and memory-profiles every phase of the inliner on a synthetic design")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("--depth", type=int, default=4, help="depth of the module hierarchy (default: %(default)s)")
+    parser.add_argument("--fanout", type=int, default=4, help="instances in each non-leaf module (default: %(default)s)")
+    parser.add_argument("--statements", type=int, default=20, help="filler statements in each module (default: %(default)s)")
+    parser.add_argument("--positional", action="store_true", help="connect the instances with positional instead of named port lists")
+    parser.add_argument("--overrides", action="store_true", help="override the parameter of every instance")
+    parser.add_argument("--comments", type=float, default=0.3, help="fraction of the statements carrying a comment (default: %(default)s)")
+    parser.add_argument("-l", "--lexer", default="char", help="the lexer engine (default: %(default)s)")
+    parser.add_argument("--compact", action="store_true", help="index the design into compact token tables")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs of every phase; the fastest is kept (default: %(default)s)")
+    parser.add_argument("-o", "--out", help="a JSON file in which to save the results")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two saved results instead of running the suite")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative increase flagged as a regression by --compare (default: %(default)s)")
+    args = parser.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.threshold)
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+    knobs = {"depth": args.depth, "fanout": args.fanout, "statements": args.statements, "named": not args.positional,
+        "overrides": args.overrides, "comments": args.comments, "lexer": args.lexer, "compact": args.compact}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "design.v")
+        with open(path, "w") as f:
+            f.write(generate_design(args.depth, args.fanout, args.statements, not args.positional, args.overrides, args.comments))
+        tokens, phases = profile(args.config, path, args.lexer, args.compact, args.repeat)
+    print(f"{tokens} tokens, {args.fanout ** args.depth} leaf instances")
+    print(f"{'phase':>15} {'seconds':>9} {'peak KB':>10} {'retained KB':>12}")
+    for name in PHASES:
+        result = phases[name]
+        print(f"{name:>15} {result['seconds']:>9.4f} {result['peak_kb']:>10.1f} {result['retained_kb']:>12.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"knobs": knobs, "python": platform.python_version(), "tokens": tokens, "phases": phases}, f, indent=4)
@@ -0,0 +1,42 @@
+''' Benchmark of the memory used per token by a list of Token objects and by a
+    TokenTable over the same text. The table figure includes the source text it
+    references, since the table keeps it alive.
+
+    Usage: python benchmarks/bench_token_memory.py [-c config.json] [--corpus sample.vl] [--copies 200]
+'''
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tokenizer import Tokenizer
+
+def measure(build):
+    ''' Returns the result of build() and the number of bytes it holds on to '''
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reports the memory per token of Token lists and TokenTables")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("--corpus", default="sample.vl", help="the Verilog text to repeat (default: %(default)s)")
+    parser.add_argument("--copies", type=int, default=200, help="number of copies of the corpus to tokenize (default: %(default)s)")
+    args = parser.parse_args()
+    tokenizer = Tokenizer(args.config, "regex")
+    with open(args.corpus) as f:
+        corpus = f.read()
+    tokens, list_size = measure(lambda: tokenizer.tokenize(corpus * args.copies))
+    count = len(tokens)
+    del tokens
+    table, table_size = measure(lambda: tokenizer.tokenize_table(corpus * args.copies))
+    print(f"tokens: {count}")
+    print(f"list of Token: {list_size / count:8.1f} bytes/token")
+    print(f"TokenTable:    {table_size / count:8.1f} bytes/token (arrays {(table_size - sys.getsizeof(table.source)) / count:.1f}, source text {len(table.source) / count:.1f})")
@@ -0,0 +1,53 @@
+''' Benchmark of the streaming token pipeline used by Inliner._index.
+    Generates synthetic Verilog files of increasing size and reports the time
+    spent indexing each one. With a linear pipeline the time per token stays
+    roughly constant as the file grows.
+
+    Usage: python benchmarks/bench_token_stream.py [-c config.json] [--sizes 250 500 1000 2000]
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inliner import Inliner
+
+MODULE_TEMPLATE = '''// synthetic module {i}
+module leaf_{i}(clk, a, b, y);
+    input clk;
+    input [7:0] a, b;
+    output reg [7:0] y;
+    /* registered sum */
+    always @(posedge clk) y <= a + b;
+endmodule
+
+'''
+
+def write_design(path, modules):
+    with open(path, 'w') as f:
+        for i in range(modules):
+            f.write(MODULE_TEMPLATE.format(i=i))
+
+def time_index(config_path, path):
+    inliner = Inliner(config_path, path)
+    start = time.perf_counter()
+    inliner._index()
+    elapsed = time.perf_counter() - start
+    tokens = sum(len(m.header) + len(m.body) for m in inliner.modules.values())
+    return tokens, elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times Inliner._index on synthetic files of growing size")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[250, 500, 1000, 2000], help="numbers of modules to generate (default: %(default)s)")
+    args = parser.parse_args()
+    print(f"{'modules':>8} {'tokens':>10} {'seconds':>9} {'us/token':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for modules in args.sizes:
+            path = os.path.join(tmp, f"design_{modules}.v")
+            write_design(path, modules)
+            tokens, elapsed = time_index(args.config, path)
+            print(f"{modules:>8} {tokens:>10} {elapsed:>9.3f} {elapsed / tokens * 1e6:>9.2f}")
@@ -0,0 +1,93 @@
+import regexes
+from tokens import TokenType
+
+_BRACKETS = {"(": ")", "[": "]", "{": "}"} # Opening brackets mapped to the closing ones
+_CLOSING = frozenset(_BRACKETS.values())
+
+def parse_connections(tokens):
+    ''' Parses a connection list, the tokens between the parentheses of the port list or of
+        the #(...) parameter list of a module instantiation, in a single pass over its tokens.
+        A list is named (".a(x), .b(y)") or positional ("x, y"), as told by its first entry.
+        Values may be any expression, including nested parentheses, bit selects and
+        concatenations; the text of a value is the contents of its tokens, without the
+        whitespace and comments.
+        Params: tokens (iterable of Token)
+        Returns:
+            named (bool) : True if the list is named
+            connections (List) : the (name, value) pairs (str, str) of a named list, or the
+                values (str) of a positional list. An empty value is an unconnected entry.
+        Raises: ValueError if the list mixes named and positional entries, if its brackets
+            are unbalanced, or if a named entry is malformed
+    '''
+    named = None
+    connections = []
+    name = None # Name of the current entry of a named list
+    value = [] # Contents of the tokens of the current value
+    closers = [] # Closing brackets expected within the current value, innermost last
+    expected = None # What must come next in a named list: "name", "(", "," or None for a new entry
+    for token in tokens:
+        token_type = token.token_type
+        if token_type is TokenType.WHTSPC or token_type is TokenType.COMMENT:
+            continue
+        content = token.content
+        if closers:
+            if content in _BRACKETS:
+                closers.append(_BRACKETS[content])
+            elif content in _CLOSING:
+                if content != closers.pop():
+                    raise ValueError(f"Unbalanced \"{content}\" in connection list")
+                if named and not closers:
+                    # The parenthesis closing the value of a named entry
+                    connections.append((name, "".join(value)))
+                    value = []
+                    expected = ","
+                    continue
+            value.append(content)
+            continue
+        if named is None:
+            named = content == "."
+        if named:
+            if expected is None:
+                if content != ".":
+                    raise ValueError(f"Positional connection \"{content}\" in named connection list")
+                expected = "name"
+            elif expected == "name":
+                if not regexes.identifier.fullmatch(content):
+                    raise ValueError(f"Invalid name \"{content}\" in named connection list")
+                name = content
+                expected = "("
+            elif expected == "(":
+                if content != "(":
+                    raise ValueError(f"Expected \"(\" after \".{name}\" in named connection list")
+                closers.append(")")
+            elif content == ",":
+                expected = None
+            else:
+                raise ValueError(f"Expected \",\" after \".{name}(...)\" in named connection list")
+        elif content == ",":
+            connections.append("".join(value))
+            value = []
+        elif content == "." and not value:
+            raise ValueError("Named connection in positional connection list")
+        elif content in _CLOSING:
+            raise ValueError(f"Unbalanced \"{content}\" in connection list")
+        else:
+            if content in _BRACKETS:
+                closers.append(_BRACKETS[content])
+            value.append(content)
+    if closers:
+        raise ValueError(f"Missing \"{closers[-1]}\" at the end of connection list")
+    if named:
+        if expected != ",":
+            raise ValueError("Incomplete entry at the end of named connection list")
+    elif named is not None:
+        connections.append("".join(value))
+    return bool(named), connections
+
+def bind_connections(named, connections, names):
+    ''' Returns the dict mapping names in the module to the connected text, given the result
+        of parse_connections. The values of a positional list are bound to names (List of str),
+        the ports or parameters of the module in order; extra values are ignored. '''
+    if named:
+        return dict(connections)
+    return dict(zip(names, connections))
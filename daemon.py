@@ -0,0 +1,238 @@
+import argparse
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from inliner import Inliner
+from inline import write_module
+from token_table import join_tokens
+from tokenizer import Tokenizer
+
+class InlinerDaemon:
+    ''' Keeps the index of a design, its reference tree and its inlined modules in memory
+        between inline requests, so a request only inlines the modules no earlier request
+        needed. Before each request, only the input files which changed are indexed again,
+        and the inlined modules depending on a module which changed are dropped.
+        Requests may come from several threads; the index and the inlined modules are only
+        updated under a lock, while the output of a request is written outside of it.
+    '''
+
+    def __init__(self, config_path, input_path, lexer="char", compact=False, cache_dir=None, jobs=None):
+        ''' The constructor
+            Params: config_path, input_path, lexer, compact, cache_dir : see Inliner
+                jobs (int) : number of processes used to index the design the first time and to
+                    inline independent modules concurrently
+        '''
+        self.settings = (config_path, input_path, lexer, compact, cache_dir)
+        self.jobs = jobs
+        self.lock = threading.RLock()
+        self.stats = {"requests": 0, "errors": 0, "files_indexed": 0, "modules_changed": 0, "modules_inlined": 0, "modules_reused": 0}
+        self._reset()
+
+    def _reset(self):
+        ''' Forgets the design; the next request indexes every input file again '''
+        self.inliner = Inliner(*self.settings)
+        self._signatures = {} # Maps each indexed input file to its modification time and size
+
+    def refresh(self):
+        ''' Indexes the input files which were added or changed since the last call, forgets
+            the modules of the removed ones, and drops the inlined modules depending on a
+            module whose text changed. Returns the names (set of str) of the changed modules
+            Raises: ValueError if the input files define a module twice
+        '''
+        with self.lock:
+            try:
+                return self._refresh()
+            except Exception:
+                # The index may be half updated; start again from scratch on the next request
+                self._reset()
+                raise
+
+    def _refresh(self):
+        ''' The body of refresh() '''
+        inliner = self.inliner
+        paths = inliner.input_files()
+        signatures = {}
+        for path in paths:
+            stat = os.stat(path)
+            signatures[path] = (stat.st_mtime_ns, stat.st_size)
+        if not self._signatures:
+            inliner._index(self.jobs)
+            inliner._generate_reference_tree()
+            self._signatures = signatures
+            self.stats["files_indexed"] += len(paths)
+            return set(inliner.modules)
+        stale = [x for x in self._signatures if signatures.get(x) != self._signatures[x]]
+        added = [x for x in paths if x not in self._signatures]
+        if not stale and not added:
+            return set()
+        old_modules = {}
+        for path in stale:
+            for name in inliner.file_modules.pop(path, []):
+                old_modules[name] = inliner.modules.pop(name)
+                del inliner.module_paths[name]
+        for path in stale + added:
+            if path in signatures:
+                inliner._index_file(path)
+        # Keep the modules in the order of the files, as a fresh index would
+        inliner.modules = {name: inliner.modules[name] for path in paths for name in inliner.file_modules.get(path, [])}
+        changed = {name for name in old_modules if name not in inliner.modules}
+        for path in stale + added:
+            for name in inliner.file_modules.get(path, []):
+                old = old_modules.get(name)
+                mod = inliner.modules[name]
+                if old is None or join_tokens(old.header) != join_tokens(mod.header) or join_tokens(old.body) != join_tokens(mod.body):
+                    changed.add(name)
+        old_tree = inliner.reference_tree
+        inliner.reference_tree = {}
+        inliner._generate_reference_tree()
+        self._invalidate(changed, old_tree)
+        self._signatures = signatures
+        self.stats["files_indexed"] += len(stale) + len(added)
+        self.stats["modules_changed"] += len(changed)
+        return changed
+
+    def _invalidate(self, changed, old_tree):
+        ''' Drops the inlined versions of the modules changed (set of str) and of the modules
+            referencing them, directly or not, in the old or the current reference tree '''
+        inliner = self.inliner
+        parents = {}
+        for tree in (old_tree, inliner.reference_tree):
+            for name, children in tree.items():
+                for child in children:
+                    parents.setdefault(child, set()).add(name)
+        stack = list(changed)
+        dropped = set()
+        while(stack):
+            name = stack.pop()
+            if name not in dropped:
+                dropped.add(name)
+                stack.extend(parents.get(name, ()))
+        for name in dropped:
+            inliner._inlined_modules.pop(name, None)
+            inliner._templates.pop(name, None)
+            inliner._cone_keys.pop(name, None)
+            inliner.size_estimates.pop(name, None)
+
+    def inline(self, tops=None):
+        ''' Returns the inlined modules (List of Module) of tops (List of str), or of every
+            module in the order inline.py writes them, inlining only the modules which are
+            not already in memory
+            Raises: ValueError if one of tops is not a module of the input files
+        '''
+        with self.lock:
+            self.refresh()
+            inliner = self.inliner
+            if tops:
+                closure = inliner.get_closure(tops)
+            else:
+                closure = inliner.reference_tree
+            inlined = inliner._inlined_modules
+            # The part of the closure still to inline, which only references itself
+            pending = {name: {x for x in children if x not in inlined} for name, children in closure.items() if name not in inlined}
+            if pending:
+                inliner._inline(self.jobs, pending)
+            self.stats["modules_inlined"] += len(pending)
+            self.stats["modules_reused"] += len(closure) - len(pending)
+            names = tops or inliner._get_inline_order(inliner.reference_tree)
+            return [inlined[name] for name in names]
+
+    def handle(self, request):
+        ''' Answers one request (dict) and returns the response (dict). The requests are:
+                {"id": 1, "tops": ["top"], "output": "out.v"} : inlines top and writes it to
+                    out.v, like inline.py -t top -o out.v. Without "tops", every module is
+                    written; without "output", the text is returned in the "text" field
+                {"id": 2, "op": "stats"} : returns the counters of the daemon in "stats"
+            A response carries the "id" of its request, "ok" and the "seconds" it took; a
+            failed request returns its "error".
+        '''
+        response = {"id": request.get("id")}
+        start = time.perf_counter()
+        try:
+            op = request.get("op", "inline")
+            if op == "stats":
+                with self.lock:
+                    response["stats"] = dict(self.stats, modules=len(self.inliner.modules), inlined=len(self.inliner._inlined_modules))
+            elif op == "inline":
+                # -t without a value appends an empty name in inline.py; ignore them alike
+                tops = [name for name in request.get("tops") or [] if name]
+                modules = self.inline(tops)
+                if request.get("output"):
+                    with open(request["output"], "w") as f:
+                        for mod in modules:
+                            write_module(f, mod)
+                    response["output"] = request["output"]
+                else:
+                    f = io.StringIO()
+                    for mod in modules:
+                        write_module(f, mod)
+                    response["text"] = f.getvalue()
+                response["modules"] = [mod.name for mod in modules]
+            else:
+                raise ValueError(f"Unknown request operation \"{op}\" in function InlinerDaemon.handle")
+            response["ok"] = True
+        except Exception as e:
+            response["ok"] = False
+            response["error"] = str(e)
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["errors"] += not response["ok"]
+        response["seconds"] = time.perf_counter() - start
+        return response
+
+    def handle_line(self, line):
+        ''' Answers one request line (str) and returns the response line (str) '''
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request is not a JSON object")
+        except ValueError as e:
+            return json.dumps({"id": None, "ok": False, "error": f"Invalid request: {e}"}) + "\n"
+        return json.dumps(self.handle(request)) + "\n"
+
+
+def serve_stream(daemon, stream_in, stream_out):
+    ''' Answers the request lines read from stream_in on stream_out until it is exhausted '''
+    for line in stream_in:
+        if line.strip():
+            stream_out.write(daemon.handle_line(line))
+            stream_out.flush()
+
+def serve_socket(daemon, path):
+    ''' Answers the requests of the clients of the Unix socket at path, each in its own thread,
+        until interrupted '''
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write(daemon.handle_line(line.decode("utf-8")).encode("utf-8"))
+    if os.path.exists(path):
+        os.unlink(path)
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves inline requests on a design kept in memory")
+    parser.add_argument("files", nargs="+", help="the input files of the design; glob patterns and directories are accepted, as by inline.py")
+    parser.add_argument("-c", "--config", default="config.json", help="the configuration file (default: %(default)s)")
+    parser.add_argument("-l", "--lexer", choices=Tokenizer.engines, default="char", help="the lexer engine used to tokenize the input (default: %(default)s)")
+    parser.add_argument("--compact", action="store_true", help="store the tokens of the indexed modules in compact token tables")
+    parser.add_argument("--cache-dir", help="a directory in which inlined modules are cached between runs")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="the number of processes used to index the design and to inline independent modules (default: %(default)s)")
+    parser.add_argument("--socket", help="the path of a Unix socket on which to serve requests, instead of stdin and stdout")
+    args = parser.parse_args()
+    daemon = InlinerDaemon(args.config, args.files, args.lexer, args.compact, args.cache_dir, args.jobs)
+    if args.socket:
+        serve_socket(daemon, args.socket)
+    else:
+        # Responses go to stdout; keep the messages of the inliner out of it
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        serve_stream(daemon, sys.stdin, stdout)
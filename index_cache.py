@@ -0,0 +1,64 @@
+import json
+import struct
+from inline_cache import InlineCache
+
+INDEX_CACHE_VERSION = b"1" # Part of every key, so that changing the indexing output invalidates old entries
+
+_MAGIC = b"IDX1" # Leading bytes of a serialized index entry
+_HEADER = struct.Struct("<4sQ") # magic, byte length of the layout
+
+class IndexCache(InlineCache):
+    ''' An on-disk store of indexed input files kept in a local directory. Each entry
+        holds the modules of one file, as serialized by pack_module, and is named after a
+        hash of the contents of the file and of the configuration (see Inliner._file_key),
+        so a later run reads the modules back instead of lexing and indexing the file again
+    '''
+
+    suffix = ".idx"
+
+    def load(self, key):
+        ''' Returns the modules (List of pack_module() tuples) stored under key, or None if
+            there is no (readable) entry '''
+        return self._read(key, load_modules)
+
+    def store(self, key, modules):
+        ''' Stores modules (List of pack_module() tuples) under key '''
+        self._write(key, dump_modules(modules))
+
+
+def dump_modules(modules):
+    ''' Serializes a list of pack_module() tuples into bytes (see load_modules). The token
+        tables of the modules are written as they are; everything else goes to a JSON layout
+    '''
+    layout = []
+    blobs = []
+    for name, header, body, ports, parameters, sites, references, declarations in modules:
+        layout.append({"name": name, "ports": ports, "parameters": parameters, "sites": sites,
+            "references": sorted(references), "declarations": declarations, "header": len(header), "body": len(body)})
+        blobs.append(header)
+        blobs.append(body)
+    layout = json.dumps(layout).encode("utf-8")
+    return b"".join([_HEADER.pack(_MAGIC, len(layout)), layout] + blobs)
+
+def load_modules(data):
+    ''' Rebuilds the list of pack_module() tuples serialized with dump_modules()
+        Params: data (bytes)
+        Returns: List of tuple
+    '''
+    magic, layout_length = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("Data passed to load_modules is not a serialized index entry")
+    pos = _HEADER.size
+    layout = json.loads(data[pos:pos + layout_length].decode("utf-8"))
+    pos += layout_length
+    modules = []
+    for entry in layout:
+        header = data[pos:pos + entry["header"]]
+        pos += entry["header"]
+        body = data[pos:pos + entry["body"]]
+        pos += entry["body"]
+        modules.append((entry["name"], header, body, entry["ports"], entry["parameters"], entry["sites"],
+            set(entry["references"]), [tuple(x) for x in entry["declarations"]]))
+    if pos != len(data):
+        raise ValueError("Serialized index entry passed to load_modules is truncated")
+    return modules
@@ -2,27 +2,44 @@ import json
 from inliner import *
 import argparse
 
-def run(config_path, input_path, output_path, top_modules=None):
+def run(config_path, input_path, output_path, top_modules=None, lexer="char", compact=False, cache_dir=None, jobs=None, mapped=False, metrics_path=None, budget=None, budget_action="error"):
     print("Running. . .")
-    i = Inliner(config_path,input_path)
-    i.inline()
-    with open(output_path,'w') as f:
-        if top_modules:
-            for name in top_modules:
-                f.write("".join(list(map(lambda x : x.to_string(), i._inlined_modules[name].header))))
-                f.write("".join(list(map(lambda x : x.to_string(), i._inlined_modules[name].body))))
-                f.write("\n\n\n")
-        else:
-            for name in i._inlined_modules:
-                f.write("".join(list(map(lambda x : x.to_string(), i._inlined_modules[name].header))))
-                f.write("".join(list(map(lambda x : x.to_string(), i._inlined_modules[name].body))))
-                f.write("\n\n\n")
+    i = Inliner(config_path,input_path,lexer,compact,cache_dir,mapped)
+    if top_modules:
+        # -t without a value appends an empty name
+        top_modules = [name for name in top_modules if name]
+    i.inline(jobs=jobs, tops=top_modules, budget=budget, budget_action=budget_action)
+    with i.metrics.phase("write"):
+        with open(output_path,'w') as f:
+            if top_modules:
+                for name in top_modules:
+                    write_module(f, i._inlined_modules[name])
+            else:
+                for name in i._inlined_modules:
+                    write_module(f, i._inlined_modules[name])
+    if metrics_path:
+        i.metrics.write(metrics_path)
+
+def write_module(f, mod):
+    ''' Writes the header and body of mod to the open file f. The tokens are streamed,
+        so an inlined body is flattened while it is written rather than held in memory '''
+    f.writelines(x.to_string() for x in mod.header)
+    f.writelines(x.to_string() for x in mod.body)
+    f.write("\n\n\n")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Performs the inlining process on file using the settings specified in config")
-    parser.add_argument("file", help="the input file whose modules will be inlined")
+    parser.add_argument("files", nargs="+", help="the input files whose modules will be inlined; glob patterns and directories, searched recursively for .v, .vl and .sv files, are accepted")
     parser.add_argument("-c", "--config", nargs=1, help="the configuration file that speficies the verilog keywords and special characters (default: %(default)s)", default=["config.json"])
     parser.add_argument("-t", "--top", nargs="?", action="append", const="", help="the top level modules that should appear in the output path; if not specified, all modules are dumped to the output path")
     parser.add_argument("-o", "--out", nargs=1, default=["out.v"], help="the output file path to which the inlined files will be dumped(default: %(default)s)")
+    parser.add_argument("-l", "--lexer", choices=Tokenizer.engines, default="char", help="the lexer engine used to tokenize the input (default: %(default)s)")
+    parser.add_argument("--compact", action="store_true", help="store the tokens of the indexed modules in compact token tables referencing the input text")
+    parser.add_argument("--mmap", action="store_true", help="memory-map the input files and lex them in place, keeping token offsets instead of copies of their text; implies --compact")
+    parser.add_argument("--cache-dir", help="a directory in which inlined modules are cached between runs; only modules whose dependencies changed are inlined again")
+    parser.add_argument("--budget", type=int, help="the largest number of tokens a module may flatten to; the sizes are estimated before inlining, which is refused if a module exceeds the budget")
+    parser.add_argument("--budget-warn", action="store_true", help="only print a warning, and inline anyway, when a module exceeds --budget")
+    parser.add_argument("--metrics", help="a JSON file in which to write the time and memory of each phase, and the cost and size of each module")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="the number of processes used to index the input files and to inline independent modules concurrently (default: %(default)s)")
     args = parser.parse_args()
-    run(args.config[0], args.file, args.out[0], args.top)
\ No newline at end of file
+    run(args.config[0], args.files, args.out[0], args.top, args.lexer, args.compact, args.cache_dir, args.jobs, args.mmap, args.metrics, args.budget, "warn" if args.budget_warn else "error")
\ No newline at end of file
@@ -0,0 +1,57 @@
+import os
+import struct
+import tempfile
+from inlined_body import dump_body, load_body
+
+CACHE_VERSION = b"1" # Part of every key, so that changing the inlining output invalidates old entries
+
+class InlineCache:
+    ''' An on-disk store of inlined module bodies kept in a local directory.
+        Each entry is a serialized module body named after its key, a hash of
+        everything the inlined body depends on (see Inliner._cone_key)
+    '''
+
+    suffix = ".tkt" # Extension of the entry files
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(self, key):
+        ''' Returns the body (TokenTable or InlinedBody) stored under key, or None if there is no (readable) entry '''
+        return self._read(key, load_body)
+
+    def store(self, key, body):
+        ''' Stores a module body (List of Token, TokenTable or InlinedBody) under key '''
+        self._write(key, dump_body(body))
+
+    def _read(self, key, decode):
+        ''' Returns decode(data) for the data stored under key, or None if there is no (readable) entry.
+            A truncated or corrupt entry may fail to decode in many ways, and is a miss as well
+        '''
+        try:
+            with open(self._path(key), "rb") as f:
+                value = decode(f.read())
+        except (OSError, ValueError, LookupError, TypeError, struct.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def _write(self, key, data):
+        ''' Stores data (bytes) under key. The entry is written to a temporary file first so
+            that concurrent runs never read a partial entry
+        '''
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,152 @@
+import json
+import struct
+from tokens import Token, TokenType
+from token_table import TokenTable
+
+_MAGIC = b"INB1" # Leading bytes of a serialized InlinedBody
+_HEADER = struct.Struct("<4sQ") # magic, byte length of the layout
+
+class InstanceRef:
+    ''' A reference, inside an InlinedBody, to the expansion of one module instance.
+        The expansion is shared by every body that contains it; the identifiers it holds
+        are renamed by prepending prefix only while the body is being iterated.
+    '''
+
+    def __init__(self, body, prefix=""):
+        ''' The constructor
+            Params:
+                body (InlinedBody) : the expansion of the instance
+                prefix (str) : text prepended to every identifier of body
+        '''
+        self.body = body
+        self.prefix = prefix
+
+
+class InlinedBody:
+    ''' The body of an inlined module, kept as a sequence of parts rather than one flat
+        list of tokens. A part is either a run of tokens (List of Token or TokenTable)
+        or an InstanceRef to the expansion of an instantiated module. Expansions are not
+        copied into the modules instantiating them, so the size of an InlinedBody grows
+        with the number of instantiation statements, not with the number of instances
+        in the flattened design.
+
+        An InlinedBody behaves like a read-only iterable of Token: iterating it yields
+        the flattened tokens one at a time.
+    '''
+
+    def __init__(self, parts=None):
+        self.parts = [] if parts is None else parts
+
+    def append(self, token):
+        ''' Appends a token to the last run of the body '''
+        self._run().append(token)
+
+    def extend(self, tokens):
+        ''' Appends tokens (iterable of Token) to the last run of the body '''
+        self._run().extend(tokens)
+
+    def append_run(self, tokens):
+        ''' Appends a run of tokens (List of Token or TokenTable) to the body, without copying it '''
+        if len(tokens):
+            self.parts.append(tokens)
+
+    def append_ref(self, ref):
+        ''' Appends an InstanceRef to the body '''
+        self.parts.append(ref)
+
+    def _run(self):
+        if not self.parts or not isinstance(self.parts[-1], list):
+            self.parts.append([])
+        return self.parts[-1]
+
+    def __iter__(self):
+        # Walks the references with an explicit stack, so deep hierarchies do not hit the recursion limit
+        stack = [(iter(self.parts), "")]
+        while(stack):
+            parts, prefix = stack[-1]
+            part = next(parts, None)
+            if part is None:
+                stack.pop()
+            elif isinstance(part, InstanceRef):
+                stack.append((iter(part.body.parts), prefix + part.prefix))
+            elif prefix:
+                for token in part:
+                    if token.token_type == TokenType.IDENTIFIER:
+                        yield Token(prefix + token.content, TokenType.IDENTIFIER)
+                    else:
+                        yield token
+            else:
+                yield from part
+
+    def to_bytes(self):
+        ''' Serializes the body into a binary string (see from_bytes). Expansions referenced
+            several times are written once, so the result is as compact as the body itself
+        '''
+        index = {} # Maps the id of every InlinedBody written so far to its position in nodes
+        nodes = []
+        tables = []
+        stack = [self]
+        while(stack):
+            body = stack[-1]
+            unwritten = [x.body for x in body.parts if isinstance(x, InstanceRef) and id(x.body) not in index]
+            if unwritten:
+                stack.extend(unwritten)
+                continue
+            stack.pop()
+            if id(body) in index:
+                continue
+            layout = []
+            for part in body.parts:
+                if isinstance(part, InstanceRef):
+                    layout.append([index[id(part.body)], part.prefix])
+                else:
+                    table = part if isinstance(part, TokenTable) else TokenTable.from_tokens(part)
+                    layout.append(len(tables))
+                    tables.append(table.to_bytes())
+            index[id(body)] = len(nodes)
+            nodes.append(layout)
+        layout = json.dumps({"nodes": nodes, "tables": [len(x) for x in tables]}).encode("utf-8")
+        return b"".join([_HEADER.pack(_MAGIC, len(layout)), layout] + tables)
+
+    @classmethod
+    def from_bytes(cls, data):
+        ''' Rebuilds an InlinedBody from the output of to_bytes(); its runs are TokenTables
+            Params: data (bytes)
+            Returns: InlinedBody
+        '''
+        magic, layout_length = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Data passed to InlinedBody.from_bytes is not a serialized InlinedBody")
+        pos = _HEADER.size
+        layout = json.loads(data[pos:pos + layout_length].decode("utf-8"))
+        pos += layout_length
+        tables = []
+        for length in layout["tables"]:
+            tables.append(TokenTable.from_bytes(data[pos:pos + length]))
+            pos += length
+        bodies = []
+        for node in layout["nodes"]:
+            parts = []
+            for part in node:
+                if isinstance(part, list):
+                    parts.append(InstanceRef(bodies[part[0]], part[1]))
+                else:
+                    parts.append(tables[part])
+            bodies.append(cls(parts))
+        return bodies[-1]
+
+
+def dump_body(body):
+    ''' Serializes a module body (List of Token, TokenTable or InlinedBody) into bytes (see load_body) '''
+    if not isinstance(body, (TokenTable, InlinedBody)):
+        body = TokenTable.from_tokens(body)
+    return body.to_bytes()
+
+def load_body(data):
+    ''' Rebuilds a module body serialized with dump_body()
+        Params: data (bytes)
+        Returns: TokenTable or InlinedBody
+    '''
+    if data[:len(_MAGIC)] == _MAGIC:
+        return InlinedBody.from_bytes(data)
+    return TokenTable.from_bytes(data)
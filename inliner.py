@@ -1,61 +1,342 @@
-import json
+import glob
+import mmap
+import os
+import time
 from tokenizer import Tokenizer
 from module import Module
 import re
-import regexes
 from tokens import TokenType, Token
-from generator_helper import GeneratorHelper
-from copy import deepcopy
+import hashlib
+from inline_cache import InlineCache, CACHE_VERSION
+from index_cache import IndexCache, INDEX_CACHE_VERSION
+from token_table import TokenTable, join_tokens
+from inlined_body import InlinedBody, InstanceRef, dump_body, load_body
+from connections import parse_connections, bind_connections
+from instance_template import ModuleTemplate, InputSlot, ParameterSlot
+from lru import LRUCache
+from metrics import InlineMetrics, flattened_length
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# Tokens are immutable, so the fixed tokens of the generated assign statements are shared by all of them
+_NEWLINE = Token("\n", TokenType.WHTSPC)
+_ASSIGN_HEAD = [_NEWLINE, Token("assign", TokenType.KEYWORD), Token(" ", TokenType.WHTSPC)]
+_ASSIGN_EQUALS = [Token(" ", TokenType.WHTSPC), Token("=", TokenType.OPERATOR), Token(" ", TokenType.WHTSPC)]
+_ASSIGN_END = [Token(";", TokenType.OPERATOR)]
+_WIRE = Token("wire", TokenType.KEYWORD)
+_FILLER_TYPES = (TokenType.WHTSPC, TokenType.COMMENT) # Tokens which a statement may hold anywhere
+# Keywords which start a declaration statement in a module body
+_DECLARATION_KEYWORDS = frozenset(["input", "output", "inout", "wire", "reg", "logic", "tri", "wand", "wor", "supply0",
+    "supply1", "integer", "real", "time", "event", "genvar", "parameter", "localparam"])
 
 class Inliner:
 
-    def __init__(self, config_path, input_path):
+    chunk_size = 1 << 16 # Number of characters read from the input file at a time
+    port_tokens = 9 # Tokens of the assignment generated for each port of an instance, e.g. "\nassign _u_a = b;"
+    source_extensions = (".v", ".vl", ".sv") # Extensions of the files read from the directories given as input
+    specialization_cache_size = 1024 # Number of (module, parameter values) specializations kept, see _specialize
+    word_regex = re.compile("[a-zA-Z_]\\w*") # Text the lexers always turn into a single token
+    # Matches a parameter declaration, capturing the name and the value of the parameter
+    param_assign_regex = r".*[\s\n]*parameter[\s\n]+([\w\$]+)[\s\n]*=[\s\n]*(.*?)[\s\n]*;"
+
+    def __init__(self, config_path, input_path, lexer="char", compact=False, cache_dir=None, mapped=False):
         self.config_path = config_path
-        self.tokenizer = Tokenizer(config_path)
-        self._token_gen = self._token_generator(input_path)
-        with open(self.config_path) as f:
-            config_data = json.load(f)
-            self.operators = config_data["operators"]
-            self.keywords = config_data["keywords"]
+        self.lexer = lexer # Name of the Tokenizer engine used to lex the input
+        self.mapped = mapped # If True, the input files are memory-mapped and lexed in place; implies compact
+        self.compact = compact or mapped # If True, module tokens are kept in TokenTables referencing the input text
+        self.tokenizer = Tokenizer(config_path, lexer)
+        self._token_gen = None # Tokens of the file being indexed
+        self.operators = self.tokenizer.operators
+        self.keywords = self.tokenizer.keywords
         self.modules = {} # Dict mapping module names in file to module names
         self._inlined_modules = {} # Dict mapping module names to their inlined versions; will be empty until _inline() is called
-        self.input_path = input_path
+        self._templates = {} # Dict mapping module names to their ModuleTemplate, compiled on first instantiation
+        self._lexed_texts = LRUCache(4096) # Tokens of the connection texts of recent instances
+        self._specializations = LRUCache(self.specialization_cache_size) # Templates resolved for the parameter values of recent instances
+        self.input_path = input_path # Verilog file, glob pattern or directory (str), or a list of them
+        self.module_paths = {} # Dict mapping module names to the file defining them
+        self.file_modules = {} # Dict mapping each input file to the names of the modules it defines
+        self.metrics = InlineMetrics() # Measurements of the last call to inline()
+        self.size_estimates = {} # Estimated sizes of the inlined modules, see estimate_sizes()
         self.reference_tree = {}
+        self.inline_cache = None # Persistent store of inlined bodies, reused across runs
+        self.index_cache = None # Persistent store of indexed input files, reused across runs
+        self._cone_keys = {} # Inline cache keys of the modules inlined so far, see _cone_key
+        if cache_dir:
+            self.inline_cache = InlineCache(cache_dir)
+            self.index_cache = IndexCache(cache_dir)
+            self._config_digest = self.tokenizer.table.digest
 
     def _token_generator(self, path_in):
+        ''' Lazily yields the tokens of the file at path_in, reading it in chunks
+            of chunk_size characters so the whole file is never held as one list
+        '''
         with open(path_in,'r') as f:
-            text = f.read()
-            tokens = self.tokenizer.tokenize(text)
-            token, *tokens = tokens
-            while(tokens):
-                yield token
-                token, *tokens = tokens
-            yield token # Yield the last element 
+            yield from self.tokenizer.tokenize_stream(self._read_chunks(f))
+
+    def _read_chunks(self, f):
+        ''' Yields successive chunks of the open file f until it is exhausted '''
+        chunk = f.read(self.chunk_size)
+        while(chunk):
+            yield chunk
+            chunk = f.read(self.chunk_size)
 
     def _get_token(self):
         return next(self._token_gen, None)
 
-    def inline(self,message=True):
-        ''' The inlining function exposed as part of the API '''
-        self._index()
+    def inline(self,message=True,jobs=None,tops=None,callback=None,budget=None,budget_action="error"):
+        ''' The inlining function exposed as part of the API
+            Params: message (bool) : print progress messages
+                    jobs (int) : number of processes used to inline independent modules concurrently
+                    tops (iterable of str) : if given, only these modules and the modules they
+                        reference (directly or not) are inlined
+                    callback (function (str, InlineMetrics) -> None) : called at the end of each
+                        phase with its name and self.metrics, which measures the run
+                    budget (int) : the largest estimated number of tokens (see estimate_sizes) a
+                        module may flatten to
+                    budget_action (str) : "error" to raise, or "warn" to print a warning and
+                        inline anyway, when a module exceeds budget
+            Raises: ValueError if one of tops is not a module of the input files, or if a
+                module exceeds budget and budget_action is "error"
+        '''
+        self.metrics = InlineMetrics(callback)
+        # A later call indexes the input files again, so it starts from an empty state
+        self.modules = {}
+        self.module_paths = {}
+        self.file_modules = {}
+        self.reference_tree = {}
+        self.size_estimates = {}
+        self._inlined_modules = {}
+        self._templates = {}
+        self._cone_keys = {}
+        with self.metrics.phase("index"):
+            self._index(jobs)
         if(message):
             print("Indexing complete . . .")
-        self._generate_reference_tree()
+            if self.index_cache:
+                print(f"Index cache: {self.index_cache.hits} files reused, {self.index_cache.misses} indexed")
+        with self.metrics.phase("reference_tree"):
+            self._generate_reference_tree()
         if(message):
             print("Reference tree generation complete . . .")
-        self._inline()
+        ref_tree = None
+        if tops:
+            with self.metrics.phase("closure"):
+                ref_tree = self.get_closure(tops)
+            if(message):
+                print(f"Inlining {len(ref_tree)} of {len(self.reference_tree)} modules reachable from {', '.join(tops)} . . .")
+        with self.metrics.phase("estimate"):
+            self.estimate_sizes(ref_tree)
+        if(message and self.size_estimates):
+            largest = max(self.size_estimates, key=lambda x: self.size_estimates[x]["tokens"])
+            estimate = self.size_estimates[largest]
+            print(f"Estimated sizes of {len(self.size_estimates)} modules, largest {largest}: {estimate['tokens']} tokens, {estimate['instances']} instances")
+        if budget is not None:
+            self._check_budget(budget, budget_action)
+        with self.metrics.phase("inline"):
+            self._inline(jobs, ref_tree)
+            self._count_tokens()
         if(message):
             print("Inlining complete . . .")
-    
-    def _index(self):
-        ''' Reads the input file '''
+            if self.inline_cache:
+                print(f"Inline cache: {self.inline_cache.hits} modules reused, {self.inline_cache.misses} rebuilt")
+            info = self.specialization_info()
+            print(f"Specialization cache: {info.hits} instances reused a specialization, {info.misses} specialized")
+
+    def estimate_sizes(self, ref_tree=None):
+        ''' Estimates the size of every module of ref_tree once inlined, without inlining
+            anything. The modules are visited in inlining order, so each estimate is the own
+            tokens of the module plus, for each of its instantiations, the estimated body of
+            the instantiated module and the assignments of its ports in place of the
+            instantiation statement.
+            Params: ref_tree (dict) : the part of the reference tree to estimate (see
+                get_closure); defaults to the whole reference tree
+            Returns: dict mapping module names (str) to dicts of tokens (int, estimated tokens
+                of the flattened module) and instances (int, module instances it flattens)
+            Pre-conditions: _generate_reference_tree() has already been called
+        '''
+        estimates = {}
+        for level in self.get_inline_levels(ref_tree):
+            for name in level:
+                mod = self.modules[name]
+                tokens = len(mod.header) + len(mod.body)
+                instances = 0
+                children = self.reference_tree[name]
+                body = mod.body
+                for site in mod.sites:
+                    child = body[site].content
+                    if child in children:
+                        # The instantiation statement is replaced by the body of the child
+                        end = site
+                        while(end < len(body) and body[end].content != ";"):
+                            end += 1
+                        child_mod = self.modules[child]
+                        tokens += estimates[child]["tokens"] - len(child_mod.header) - (end + 1 - site) + self.port_tokens * len(child_mod.ports)
+                        instances += 1 + estimates[child]["instances"]
+                estimates[name] = {"tokens": tokens, "instances": instances}
+        self.size_estimates = estimates
+        for name, estimate in estimates.items():
+            metrics = self.metrics.module(name)
+            metrics["estimated_tokens"] = estimate["tokens"]
+            metrics["estimated_instances"] = estimate["instances"]
+        return estimates
+
+    def _check_budget(self, budget, action):
+        ''' Raises a ValueError, or prints a warning if action is "warn", if the estimated
+            size of a module exceeds budget tokens
+            Pre-conditions: estimate_sizes() has already been called
+        '''
+        over = sorted([x for x in self.size_estimates.items() if x[1]["tokens"] > budget], key=lambda x: -x[1]["tokens"])
+        if not over:
+            return
+        listed = ", ".join(f"{name} ({estimate['tokens']} tokens)" for name, estimate in over[:5])
+        if len(over) > 5:
+            listed += f" and {len(over) - 5} more"
+        if action == "warn":
+            print(f"WARNING: Modules estimated to exceed the budget of {budget} tokens once inlined: {listed}")
+            return
+        raise ValueError(f"Modules estimated to exceed the budget of {budget} tokens once inlined in function Inliner.inline: {listed}\nInline fewer top modules or raise the budget")
+
+    def _count_tokens(self):
+        ''' Fills in the token counts of self.metrics, once the modules have been inlined '''
+        lengths = {} # Flattened lengths of the shared expansions, see flattened_length
+        # List the modules in inlining order
+        self.metrics.modules = {name: self.metrics.module(name) for name in self._inlined_modules}
+        for name, mod in self._inlined_modules.items():
+            metrics = self.metrics.module(name)
+            metrics["input_tokens"] = len(self.modules[name].header) + len(self.modules[name].body)
+            metrics["output_tokens"] = len(mod.header) + flattened_length(mod.body, lengths)
+            if isinstance(mod.body, InlinedBody):
+                metrics["instances"] = sum(isinstance(x, InstanceRef) for x in mod.body.parts)
+        modules = self.metrics.modules.values()
+        self.metrics.totals = {"input_tokens": sum(len(x.header) + len(x.body) for x in self.modules.values()),
+            "modules": len(self.modules), "inlined_modules": len(self._inlined_modules),
+            "instances": sum(x["instances"] for x in modules), "output_tokens": sum(x["output_tokens"] for x in modules),
+            "specialization_hits": self._specializations.hits, "specialization_misses": self._specializations.misses}
+
+    def input_files(self):
+        ''' Returns the Verilog files (List of str) designated by input_path: its files, the
+            matches of its glob patterns, and the files of its directories, searched recursively,
+            whose extension is one of source_extensions. Each file appears once, in order.
+            Raises: ValueError if a glob pattern matches no file
+        '''
+        entries = [self.input_path] if isinstance(self.input_path, str) else self.input_path
+        files = []
+        for entry in entries:
+            if os.path.isdir(entry):
+                for root, dirs, names in os.walk(entry):
+                    dirs.sort() # Walk the subdirectories in a deterministic order
+                    files.extend(os.path.join(root, x) for x in sorted(names) if x.endswith(self.source_extensions))
+            elif glob.has_magic(entry):
+                matches = sorted(glob.glob(entry, recursive=True))
+                if not matches:
+                    raise ValueError(f"No input file matches the pattern {entry} in function Inliner.input_files")
+                files.extend(matches)
+            else:
+                files.append(entry)
+        return list(dict.fromkeys(os.path.normpath(x) for x in files))
+
+    def _index(self, jobs=None):
+        ''' Reads the input files into self.modules
+            Params: jobs (int) : if greater than 1, the files are indexed concurrently in a
+                pool of that many processes. Mapped files are always indexed in this process,
+                since the workers would send back a copy of their text
+                    With an index cache, the files whose contents are unchanged since a previous
+                run are read back from it instead
+            Raises: ValueError if two modules have the same name
+        '''
+        paths = self.input_files()
+        keys = {} # Index cache keys of the files
+        cached = {} # Serialized modules of the files found in the index cache
+        if self.index_cache:
+            for path in paths:
+                keys[path] = self._file_key(path)
+                modules = self.index_cache.load(keys[path])
+                if modules is not None:
+                    cached[path] = modules
+        pending = [x for x in paths if x not in cached]
+        executor = None
+        results = iter(())
+        if jobs and jobs > 1 and len(pending) > 1 and not self.mapped:
+            # Each task holds several files, so thousands of small files do not cost one round trip each
+            chunksize = max(1, len(pending) // (jobs * 4))
+            executor = ProcessPoolExecutor(jobs)
+            results = executor.map(_index_worker, repeat(self.config_path), repeat(self.lexer), repeat(self.compact), pending, chunksize=chunksize)
+        try:
+            # Merge in the order of the files, so the index does not depend on the number of jobs
+            for path in paths:
+                if path in cached:
+                    modules = cached[path]
+                elif executor:
+                    modules = next(results)
+                else:
+                    self._index_file(path)
+                    if self.index_cache:
+                        self.index_cache.store(keys[path], [pack_module(self.modules[x]) for x in self.file_modules.get(path, [])])
+                    continue
+                for packed in modules:
+                    self._add_module(unpack_module(packed), path)
+                if self.index_cache and path not in cached:
+                    self.index_cache.store(keys[path], modules)
+        finally:
+            if executor:
+                executor.shutdown()
+
+    def _file_key(self, path):
+        ''' Returns the index cache key (str) of the file at path: a hash of its contents and of
+            the configuration, which are all its modules depend on '''
+        digest = hashlib.sha256(INDEX_CACHE_VERSION)
+        digest.update(self._config_digest)
+        with open(path, "rb") as f:
+            chunk = f.read(self.chunk_size)
+            while(chunk):
+                digest.update(chunk)
+                chunk = f.read(self.chunk_size)
+        return digest.hexdigest()
+
+    def _index_file(self, path):
+        ''' Reads the modules of the file at path into self.modules '''
+        if self.compact:
+            self._index_table(path)
+            return
+        self._token_gen = self._token_generator(path)
         token = self._get_token()
         while(token):
             if token.content == "module":
-                self._process_module(token)
+                self._process_module(token, path)
             token = self._get_token()
+        self._token_gen = None
+
+    def _index_table(self, path):
+        ''' Reads the file at path into one TokenTable, and indexes each module as a view of it.
+            If mapped, the table references the memory-mapped bytes of the file instead of a copy
+            of its text.
+        '''
+        if self.mapped:
+            with open(path,'rb') as f:
+                # The map outlives the file object, and is released with the last view of it
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+            table = self.tokenizer.tokenize_bytes(data)
+        else:
+            with open(path,'r') as f:
+                table = self.tokenizer.tokenize_table(f.read())
+        start = 0 # Offset of the "module" keyword of the current module
+        balance = 0
+        for i, token in enumerate(table):
+            if token.token_type is not TokenType.KEYWORD:
+                continue
+            if token.content == "module":
+                if balance == 0:
+                    start = i
+                balance += 1
+            elif token.content == "endmodule" and balance != 0:
+                balance -= 1
+                if balance == 0:
+                    self._build_module(table[start:i + 1], path)
+        if balance != 0:
+            raise ValueError(f"Incomplete module input into function Inliner._index_table\nCheck input file {path} for proper Verilog Syntax")
 
-    def _process_module(self, token):
+    def _process_module(self, token, path):
         balance = 1
         module_content = [token] # Store the first token in the list
         token = self._get_token()
@@ -68,43 +349,139 @@ class Inliner:
             module_content.append(token)
             token = self._get_token()
         if not token and balance != 0:
-            raise ValueError(f"Incomplete module input into function Inliner._process_module\nCheck input file {self.input_path} for proper Verilog Syntax")
-        # Process the module header
-        module_header = []
-        module_body = module_content
-        for token in module_body:
-            module_header.append(token)
-            module_body = module_body[1:]
-            if token.content == ";":
-                break   
-        # Get the module name
-        i = 0
-        while(module_header[i].token_type != TokenType.IDENTIFIER):
-            i += 1
-        name = module_header[i].content
-        raw_module_header = list(map(lambda x: x.to_string(), module_header)) # Make a string version to call balanced bounds
-        # Process the port list from the header
-        ports = []
-        open_paren_idx = raw_module_header.index("(")
-        close_paren_idx = balanced_bounds(raw_module_header,"(",")",open_paren_idx)
-        port_list = module_header[open_paren_idx:close_paren_idx+1]
+            raise ValueError(f"Incomplete module input into function Inliner._process_module\nCheck input file {path} for proper Verilog Syntax")
+        self._build_module(module_content, path)
+
+    def _build_module(self, module_content, path=None):
+        ''' Creates the Module object for the tokens of one module, from the "module"
+            keyword to "endmodule", and stores it in self.modules. The tokens are read in a
+            single pass: the header first, then the body.
+            Params: module_content (List of Token or TokenTable)
+                    path (str) : the file defining the module
+        '''
+        tokens = enumerate(module_content)
+        # Process the module header: "module name [#(parameters)] [(ports)];"
+        name = None
         ports = []
-        for token in port_list:
-            if token.token_type == TokenType.IDENTIFIER:
-                ports.append(token.content)
-        # Process the parameter list in the module header
         parameters = []
+        header_end = len(module_content)
+        depth = 0 # Nesting of the parentheses
+        brackets = 0 # Nesting of the square brackets, whose identifiers belong to ranges
+        in_parameters = False # True while reading the parameter list of the header
+        expect_parameter = False # True until the first identifier of a parameter declaration
+        port = None # Last identifier of the current port declaration, which names the port
+        for i, token in tokens:
+            content = token.content
+            if token.token_type is TokenType.IDENTIFIER:
+                if name is None:
+                    name = content
+                elif depth == 1 and brackets == 0:
+                    if not in_parameters:
+                        port = content
+                    elif expect_parameter:
+                        parameters.append(content)
+                        expect_parameter = False
+            elif content == "(":
+                depth += 1
+                if depth == 1:
+                    expect_parameter = True
+            elif content == ")":
+                depth -= 1
+                if depth == 0:
+                    if port is not None:
+                        ports.append(port)
+                        port = None
+                    in_parameters = False
+            elif content == "[":
+                brackets += 1
+            elif content == "]":
+                brackets -= 1
+            elif content == "," and depth == 1:
+                if port is not None:
+                    ports.append(port)
+                    port = None
+                expect_parameter = True
+            elif content == "#" and depth == 0:
+                in_parameters = True
+            elif content == ";" and depth == 0:
+                header_end = i + 1
+                break
+        if name is None:
+            raise ValueError(f"Module without a name in function Inliner._build_module\nCheck input file {path} for proper Verilog Syntax")
+        # Process the body: parameters, declarations and instantiation sites
+        sites = []
+        references = set()
+        declarations = []
+        declaration = None # Offset of the first token of the current declaration
         hit_parameter = False
-        for token in module_body:
-            if token.token_type == TokenType.KEYWORD and token.content == "parameter":
+        in_parameter_statement = False # True inside a parameter declaration, which may declare several parameters
+        parameter_depth = 0 # Nesting of the parentheses, brackets and braces of the parameter declaration
+        parameter = None # Last identifier of the current parameter declaration, before its "="
+        statement_start = True # True if the next significant token starts a statement
+        previous = None # Offset of the previous token which is not whitespace or a comment, if an identifier
+        for i, token in tokens:
+            token_type = token.token_type
+            if token_type is TokenType.WHTSPC or token_type is TokenType.COMMENT or token_type is TokenType.EMPTY_STRING:
+                continue
+            i -= header_end
+            # An instantiation reads "module_name [#(...)] instance_name ...", so its first
+            # identifier is directly followed by "#" or by another identifier
+            if token_type is TokenType.IDENTIFIER:
+                if hit_parameter:
+                    parameter = token.content
+                if previous is not None:
+                    sites.append(previous)
+                    references.add(module_content[previous + header_end].content)
+                previous = i
+                statement_start = False
+                continue
+            content = token.content
+            if token_type is TokenType.KEYWORD:
+                if statement_start and content in _DECLARATION_KEYWORDS:
+                    declaration = i
+                if content == "parameter":
+                    hit_parameter = True
+                    in_parameter_statement = True
+                    parameter_depth = 0
+            elif content == "#":
+                if previous is not None:
+                    sites.append(previous)
+                    references.add(module_content[previous + header_end].content)
+            elif content == "=":
+                if hit_parameter and parameter is not None:
+                    parameters.append(parameter)
+                    parameter = None
+                hit_parameter = False
+            elif in_parameter_statement and content[0] in "([{)]}":
+                # Concatenations may be lexed as one operator, e.g. "{{" or "}}"
+                parameter_depth += sum(x in "([{" for x in content) - sum(x in ")]}" for x in content)
+            elif content == "," and in_parameter_statement and parameter_depth == 0:
+                # The next declarator of "parameter W = 8, V = 3;"
                 hit_parameter = True
-            if hit_parameter:
-                if token.token_type == TokenType.IDENTIFIER:
-                    parameters.append(token.content)
-                    hit_parameter = False
+            elif content == ";":
+                hit_parameter = False
+                in_parameter_statement = False
+                if declaration is not None:
+                    declarations.append((declaration, i + 1))
+                    declaration = None
+                previous = None
+                statement_start = True
+                continue
+            previous = None
+            statement_start = False
         # Make the module object
-        mod = Module(name, module_body, module_header, ports, parameters)
-        self.modules[name] = mod
+        mod = Module(name, module_content[header_end:], module_content[:header_end], ports, parameters, sites, references, declarations)
+        self._add_module(mod, path)
+
+    def _add_module(self, mod, path):
+        ''' Stores mod, defined in the file at path, in self.modules
+            Raises: ValueError if another module with the same name is already stored
+        '''
+        if mod.name in self.modules:
+            raise ValueError(f"Duplicate definitions of module {mod.name} detected in function Inliner._add_module\nCheck input files {self.module_paths[mod.name]} and {path}")
+        self.modules[mod.name] = mod
+        self.module_paths[mod.name] = path
+        self.file_modules.setdefault(path, []).append(mod.name)
 
     def _generate_reference_tree(self):
         ''' Algorithm to generate the reference tree which
@@ -113,77 +490,159 @@ class Inliner:
             This can then be used to efficiently inline the files without error.
             Pre-conditions: The modules have already been indexed with _index()
         '''
-        for name in self.modules:
-            self.reference_tree[name] = set()
         for name, mod in self.modules.items():
-            for token in mod.body:
-                if token.token_type == TokenType.IDENTIFIER and token.content in self.modules:
-                    # This module contains a reference to another module 
-                    self.reference_tree[name].add(token.content)
+            # The instantiation sites recorded while indexing name the modules this module references
+            self.reference_tree[name] = {x for x in mod.references if x in self.modules}
 
-    def _inline(self):
+    def _inline(self, jobs=None, ref_tree=None):
         ''' Algorithm to inline all modules into one single module for output
+            Params: jobs (int) : if greater than 1, the modules of each level of the inlining
+                order are inlined concurrently in a pool of that many processes
+                    ref_tree (dict) : the part of the reference tree to inline (see get_closure);
+                defaults to the whole reference tree. The modules it references but does not
+                contain must already be inlined
             Pre-conditions: _index() and _generate_reference_tree() have already been called
         '''
         # Phase 1: Establish the inlining order based on the reference tree
-        order = self._get_inline_order(self.reference_tree)       
-        for name in order:
-            if not self.reference_tree[name]:
-                # This module is a leaf; it references no other modules
-                self._inlined_modules[name] = self.modules[name]
-            else:
-                # Inline this module
-                self._inlined_modules[name] = self._get_inlined_module(name)
+        levels = self.get_inline_levels(ref_tree)
+        keys = self._cone_keys
+        packed = {} # Serialized inlined modules, shipped to the worker processes
+        executor = ProcessPoolExecutor(jobs) if jobs and jobs > 1 else None
+        try:
+            for level in levels:
+                # The modules of one level only reference modules of earlier levels
+                inlined = {}
+                pending = []
+                for name in level:
+                    if not self.reference_tree[name]:
+                        # This module is a leaf; it references no other modules
+                        inlined[name] = self.modules[name]
+                    else:
+                        pending.append(name)
+                    if self.inline_cache:
+                        keys[name] = self._cone_key(name, keys)
+                        if name in pending:
+                            body = self.inline_cache.load(keys[name])
+                            if body is not None:
+                                # Its dependency cone is unchanged since a previous run
+                                inlined[name] = self._inlined_copy(name, body)
+                                pending.remove(name)
+                                self.metrics.module(name)["cached"] = True
+                if executor and len(pending) > 1:
+                    # Submit the largest modules first, so they do not end up last on an otherwise idle pool
+                    order = sorted(pending, key=lambda x: -self.size_estimates.get(x, {"tokens": 0})["tokens"])
+                    tasks = {name: executor.submit(_inline_worker, self.config_path, self.input_path, self.lexer, *self._worker_input(name, packed)) for name in order}
+                    for name in pending:
+                        data, seconds = tasks[name].result()
+                        inlined[name] = self._inlined_copy(name, load_body(data))
+                        self.metrics.module(name)["seconds"] = seconds
+                else:
+                    for name in pending:
+                        start = time.perf_counter()
+                        inlined[name] = self._get_inlined_module(name)
+                        self.metrics.module(name)["seconds"] = time.perf_counter() - start
+                for name in pending:
+                    if self.inline_cache:
+                        self.inline_cache.store(keys[name], inlined[name].body)
+                # Store the level in order, so the result does not depend on the number of jobs
+                for name in level:
+                    self._inlined_modules[name] = inlined[name]
+        finally:
+            if executor:
+                executor.shutdown()
+
+    def _inlined_copy(self, name, body):
+        ''' Returns the inlined Module of name with the given body and the header, ports
+            and parameters of the original module '''
+        mod = self.modules[name]
+        return Module(name, body, mod.header, mod.ports, mod.parameters)
+
+    def _worker_input(self, name, packed):
+        ''' Returns the serialized modules a worker process needs to inline module name:
+            the original module, plus the original and inlined versions of its children
+            Params: name (str), packed (dict memoizing serialized inlined modules)
+            Returns: name (str), modules (dict), inlined (dict) mapping names to pack_module() tuples
+        '''
+        modules = {name: pack_module(self.modules[name])}
+        inlined = {}
+        for child in self.reference_tree[name]:
+            modules[child] = pack_module(self.modules[child])
+            if child not in packed:
+                packed[child] = pack_module(self._inlined_modules[child])
+            inlined[child] = packed[child]
+        return name, modules, inlined
+
+    def _cone_key(self, name, keys):
+        ''' Returns the inline cache key (str) of a module: a hash of the configuration,
+            the module's own tokens and the keys of the modules it references. The key
+            therefore changes whenever anything in the module's dependency cone changes.
+            Params: name (str), keys (dict mapping module names to their keys)
+            Pre-conditions: keys contains every module referenced by name
+        '''
+        mod = self.modules[name]
+        h = hashlib.sha256(CACHE_VERSION)
+        h.update(self._config_digest)
+        for text in (name, join_tokens(mod.header), join_tokens(mod.body)):
+            h.update(text.encode("utf-8"))
+            h.update(b"\0")
+        for child in sorted(self.reference_tree[name]):
+            h.update(f"{child}:{keys[child]}\0".encode("utf-8"))
+        return h.hexdigest()
 
     def _get_inlined_module(self, name):
         ''' Function which given a name appearing in the modules dictionary creates an inlined version of it
         Params: name (str) which appears in self.modules
-        Returns: Inlined module object (module)
+        Returns: Inlined module object (module), whose body is an InlinedBody
         Pre-conditions:  _inline() is calling this function in the correct order, as the modules referenced by 
                         'name' must be inlined before 'name' 
         '''
-        top_body = self.modules[name].body
-        new_body = []
-        gen = GeneratorHelper(top_body)
-        token = gen.get_element()
-        while(token):
-            if token.token_type == TokenType.IDENTIFIER and token.content in self._inlined_modules:
-                try:
-                    inlined_portion = self._process_module_instantiation(gen,token)
-                    new_body.extend(inlined_portion)
-                except ValueError as e:
-                    raise ValueError(f"Error encountered while attempting to inline module {name}:\n{str(e)}")
-            else:
-                new_body.append(token)
-            token = gen.get_element()
-        return Module(name, new_body, self.modules[name].header, self.modules[name].ports, self.modules[name].parameters)
+        mod = self.modules[name]
+        top_body = mod.body
+        new_body = InlinedBody()
+        pos = 0 # Offset of the first token of top_body not yet added to new_body
+        for site in mod.sites:
+            if site < pos or top_body[site].content not in self._inlined_modules:
+                continue
+            # The tokens between two instantiations are kept as they are
+            new_body.append_run(top_body[pos:site])
+            try:
+                expansion, pos = self._process_module_instantiation(top_body, site)
+                new_body.append_ref(InstanceRef(expansion))
+            except ValueError as e:
+                raise ValueError(f"Error encountered while attempting to inline module {name}:\n{str(e)}")
+        new_body.append_run(top_body[pos:])
+        return Module(name, new_body, mod.header, mod.ports, mod.parameters)
                 
-    def _process_module_instantiation(self, gen, curr_token):
-        ''' Method to extract a module instantiation from a generator input 
-        stream gen (GeneratorHelper), process it, and then write it to the output (List of Token) 
+    def _process_module_instantiation(self, body, start):
+        ''' Method to extract the module instantiation starting at offset start of body
+        (List of Token or TokenTable), process it, and then return its expansion (InlinedBody)
+        and the offset of the first token following the instantiation
         '''
-        balance = 1
-        instance_type = curr_token
-        statement = [curr_token]
-        token = gen.get_element()
-        while(token and token.content != ";"):
-            statement.append(token)
-            token = gen.get_element()
-        if not token:
+        end = start
+        while(end < len(body) and body[end].content != ";"):
+            end += 1
+        if end == len(body):
             raise ValueError(f"Incomplete module instantiation detected in input to Inliner in function Inliner._process_module_instantiation\nCheck input file {self.input_path} for proper Verilog Syntax")
-        statement.append(token) # Add on the ending semicolon
+        statement = list(body[start:end + 1]) # Including the ending semicolon
         try:
             inlined_portion = self._instantation_to_inlined_body(statement)
         except ValueError:
             raise # Just hand it up to the caller function
         else:
-            return inlined_portion
+            return inlined_portion, end + 1
 
     def _instantation_to_inlined_body(self, instantiation):
         ''' Accepts text of a  module instantiation (List of Tokens) 
             in verilog syntax. Returns the body of the module instantiated with
-            the correct I/O assignments '''
-            
+            the correct I/O assignments (InlinedBody) '''
+        module_name, instance_name, param_assignments, port_assignments = self._parse_instantiation(instantiation)
+        return self._expand_instance(module_name, instance_name, param_assignments, port_assignments)
+
+    def _parse_instantiation(self, instantiation):
+        ''' Accepts text of a  module instantiation (List of Tokens) in verilog syntax.
+            Returns: module_name (str), instance_name (str),
+                param_assignments, port_assignments (dict mapping names in the module to the connected text)
+        '''
         raw_text = list(map( lambda x : x.to_string(), instantiation))
 
         # Get the names
@@ -191,13 +650,12 @@ class Inliner:
         i = 1
 
         # Get the parameter assignment list, if it exists
-        param_list = []
+        param_list = None
         if "#" in raw_text:
             idx = raw_text.index("#")
             param_list_start = raw_text.index("(",idx)
             param_list_end = balanced_bounds(raw_text, "(", ")", param_list_start)
             param_list = instantiation[param_list_start + 1 : param_list_end]
-            param_list = [tok for tok in param_list if tok.token_type != TokenType.COMMENT and tok.token_type != TokenType.WHTSPC]
             i = param_list_end + 1
 
         while(instantiation[i].token_type != TokenType.IDENTIFIER):
@@ -206,152 +664,260 @@ class Inliner:
 
 
         # Get the port assignment list
-        if param_list:
-            port_list_start = raw_text.index("(", i + 1)
-        else:
-            port_list_start = raw_text.index("(")
+        port_list_start = raw_text.index("(", i + 1)
         port_list_end = balanced_bounds(raw_text, "(", ")", port_list_start)
         port_list = instantiation[port_list_start + 1 : port_list_end]
-        port_list = [tok for tok in port_list if tok.token_type != TokenType.COMMENT and tok.token_type != TokenType.WHTSPC]
-
-        # Identify the type of port list (positional or named) and param list (positional or named)
-        port_list_text = "".join([x.to_string() for x in port_list])
-        param_list_text = "".join([x.to_string() for x in param_list])
-        # A regex for an identifier or an indexed identifier
-        
-        # Regexes to match the naming list and positional list convention of port/parameter assignment
-        param_positional = regexes.positional_port_list.fullmatch(param_list_text)
-        param_naming = regexes.named_port_list.fullmatch(param_list_text)
-        port_positional = regexes.positional_port_list.fullmatch(port_list_text)
-        port_naming = regexes.named_port_list.fullmatch(port_list_text)
 
-        # Parse the param and port assignment lists now that we know their format
+        # Classify and parse the param and port assignment lists (positional or named) in one pass each
         param_assignments = {}
-        if param_list:
-            if param_naming:
-                param_assignments = self._parse_named_param_list(param_list, module_name)
-            elif param_positional:
-                param_assignments = self._parse_positional_param_list(param_list, module_name)
+        if param_list is not None:
+            param_assignments = self._parse_connection_list(param_list, self.modules[module_name].parameters, "parameter", raw_text)
+        port_assignments = self._parse_connection_list(port_list, self.modules[module_name].ports, "port", raw_text)
+
+        return module_name, instance_name, param_assignments, port_assignments
+
+    def _expand_instance(self, module_name, instance_name, param_assignments, port_assignments):
+        ''' Returns the body (InlinedBody) of one instance of module_name: the inlined body of the
+            module with its identifiers prefixed by the instance name, its inputs and outputs turned
+            into wires or regs assigned from the connections, and its parameters overridden.
+            The module is analysed once, by _get_template, and specialized once for each set of
+            parameter values, by _specialize; an instance only connects its ports. Its shared
+            statements and the expansions of the modules it instantiates are referenced, not
+            copied, with the instance prefix composed onto their own, and are renamed when the
+            body is iterated.
+            Params: module_name (str), instance_name (str),
+                param_assignments, port_assignments (dict) : see _parse_instantiation
+        '''
+        template = self._get_template(module_name)
+        # Prefixing a name prepends text to it, so the prefixes compose by concatenation
+        prefix = self._prefix_name(instance_name, "")
+        inlined_body = InlinedBody()
+        for part in self._specialize(module_name, param_assignments):
+            if isinstance(part, InstanceRef):
+                inlined_body.append_ref(InstanceRef(part.body, self._prefix_name(instance_name, part.prefix)))
+            elif isinstance(part, InlinedBody):
+                inlined_body.append_ref(InstanceRef(part, prefix))
+            elif isinstance(part, InputSlot):
+                inlined_body.append_ref(InstanceRef(part.base, prefix))
+                for port, value in port_assignments.items():
+                    if value and port in part.names:
+                        # If the port wasn't left empty
+                        inlined_body.extend(self._assignment(self._renamed_port(instance_name, port), self._lexed(value)))
             else:
-                raise ValueError(f"Invalid parameter list syntax detected in Inliner._instantiation_to_inlined_body:" /
-            "\n" + "".join(raw_text) + "\n" + f"Check file {self.input_path} for proper verilog syntax.")
-        port_assignments = {}
-        if port_naming:
-            port_assignments = self._parse_named_port_list(port_list, module_name)
-        elif port_positional:
-            port_assignments = self._parse_positional_port_list(port_list, module_name)
-
-        # Resolve naming collisions by prefixing variable names
-        old_body = deepcopy(self._inlined_modules[module_name].body)
-        for token in old_body:
-            if token.token_type == TokenType.IDENTIFIER:
-                token.content = self._prefix_name(instance_name,token.content)
-        for key in param_assignments.copy():
-            new_key = self._prefix_name(instance_name,key)
-            param_assignments[new_key] = param_assignments[key]
-            del param_assignments[key]
-        for key in port_assignments.copy():
-            new_key = self._prefix_name(instance_name,key)
-            port_assignments[new_key] = port_assignments[key]
-            del port_assignments[key]
-
-        # Modify the body of the module by adding assignments, and renaming inputs and outputs to wires or regs.
-        inlined_body = []
-        gen = GeneratorHelper(old_body)
-        token = gen.get_element()
-        buffer = []
-        output_regs = []
-        output_wires = []
-        tkzr = Tokenizer(self.config_path)
-        # Change the input and output declarations
-        while( token.content != 'endmodule'):
-            buffer.append(token)
-            # End of a statement, process it
-            if buffer[-1].content == ";":
-                # stmt is buffer without comments
-                stmt = [x for x in buffer if x.token_type != TokenType.COMMENT]
-                stmt = list(map(lambda x : x.to_string(), stmt))
-                modified_stmt = deepcopy(stmt)
-                if "input" in stmt:
-                    i = stmt.index("input")
-                    modified_stmt[i] = "wire"
-                    ports = [key for key in port_assignments if key in stmt] # Input ports mentioned in the statement
-                    for port in ports:
-                        if port_assignments[port]:
-                            # If the port wasn't left empty
-                            modified_stmt.append("\n")
-                            modified_stmt.append(f"assign {port} = {port_assignments[port]};")
-                elif "output" in stmt:
-                    start = 0
-                    end = 0
-                    if "[" in stmt:
-                        # Remove the size field
-                        size_field = True
-                        start = stmt.index("[")
-                        end = balanced_bounds(stmt,"[","]",start)
-                    text = "".join(stmt)
-                    output_reg_re = '[\\s\n]*output[\\s\n]+reg'
-                    hasOutputReg = re.match(output_reg_re,text)
-                    if hasOutputReg:
-                        modified_stmt.remove("output")
-                        for t in buffer[end:]:
-                            if t.token_type == TokenType.IDENTIFIER:
-                                output_regs.append(t)
-                    else:
-                        i = stmt.index("output")
-                        modified_stmt[i] = "wire"
-                        for t in buffer[end:]:
-                            if t.token_type == TokenType.IDENTIFIER:
-                                output_wires.append(t)
-                elif "inout" in stmt:
-                    # TODO implement functionality for inout ports
-                    pass
-                elif "parameter" in stmt:
-                    # TODO: implement detection multiple assignments of multiple params in one line
-                    # Example: 'parameter P1, P2, P3 = <value>'
-                    param_assign_regex = ".*[\s\n]*parameter[\s\n]+([\w\$]+)[\s\n]*=[\s\n]*(.*?)[\s\n]*;"
-                    m = re.match(param_assign_regex, "".join(stmt))
-                    if m:
-                        if m.group(1) in param_assignments:
-                            val_idx = modified_stmt.index(m.group(2))
-                            modified_stmt[val_idx] = param_assignments[m.group(1)]
-                modified_stmt = tkzr.tokenize( "".join(modified_stmt) )
-                i = 0
-                j = 0
-                # Merge the comments back into the output added to the inlined body
-                while(i < len(modified_stmt) and j < len(buffer)): 
-                    if buffer[j].token_type == TokenType.COMMENT:
-                        inlined_body.append(buffer[j])
-                        j += 1
-                    else:
-                        inlined_body.append(modified_stmt[i])
-                        i += 1
-                        j += 1
-                if len(buffer) < len(modified_stmt):
-                    while(i < len(modified_stmt)):
-                        inlined_body.append(modified_stmt[i])
-                        i += 1
-                elif len(modified_stmt) < len(buffer):
-                    while(j < len(buffer) - 1): # Minus 1 to avoid the final semicolon
-                        inlined_body.append(buffer[j])
-                        j += 1
-                buffer = [] # Empty the buffer
-            token = gen.get_element()
-        inlined_body.extend(buffer)
+                # The value of an overridden parameter, written in the instantiating module, so not renamed
+                inlined_body.extend(part)
         # Add on the output assignments at the end of the module body
         # TODO: There will be errors if the connection to the output is a reg because these are continuous assignments
         # How do we solve this problem?
-        for port in output_regs:
-            if port_assignments[port.content]: # Don't add if the port was left disconnected
-                s = f"\nassign {port_assignments[port.content]} = {port.content};"
-                inlined_body.extend( tkzr.tokenize(s) )
-        for port in output_wires:
-            if port_assignments[port.content]: # Don't add if the port was left disconnected
-                s = f"\nassign {port_assignments[port.content]} = {port.content};"
-                inlined_body.extend( tkzr.tokenize(s) )
-        inlined_body.append( Token("\n", TokenType.WHTSPC) )
+        for port in template.output_regs + template.output_wires:
+            if port_assignments[port]: # Don't add if the port was left disconnected
+                inlined_body.extend(self._assignment(self._lexed(port_assignments[port]), self._renamed_port(instance_name, port)))
+        inlined_body.append( _NEWLINE )
         return inlined_body
-        
+
+    def _specialize(self, module_name, param_assignments):
+        ''' Returns the parts (List) of the template of module_name for the parameter values
+            param_assignments (dict): the parts of the template, with each ParameterSlot replaced
+            by its shared statement, or, if the instance overrides it, by the shared statement
+            cut around the default value and the tokens (List of Token) of the new value in
+            between. Specializations are kept in a bounded cache keyed by the module name and
+            the values of the parameters it declares, so the instances sharing parameter values
+            share the specialized statements as well.
+        '''
+        template = self._get_template(module_name)
+        overrides = tuple(sorted((name, value) for name, value in param_assignments.items() if name in template.parameters))
+        key = (module_name, overrides)
+        cached = self._specializations.get(key)
+        # A template compiled again (e.g. once the module changed) invalidates its specializations
+        if cached is not None and cached[0] is template:
+            return cached[1]
+        values = dict(overrides)
+        parts = []
+        for part in template.parts:
+            if not isinstance(part, ParameterSlot):
+                parts.append(part)
+            elif part.name in values:
+                # The value is spliced in place of the default, between the comments of the statement
+                parts.append(InlinedBody([part.buffer[:part.start]]))
+                parts.append(self._lexed(values[part.name]) + part.comments)
+                parts.append(InlinedBody([part.buffer[part.end:]]))
+            else:
+                parts.append(part.body)
+        self._specializations.put(key, (template, parts))
+        return parts
+
+    def specialization_info(self):
+        ''' Returns the statistics of the specialization cache (see _specialize) as a
+            CacheInfo(hits, misses, maxsize, currsize) '''
+        return self._specializations.info()
+
+    def _assignment(self, target, value):
+        ''' Returns the tokens (List of Token) of the statement "\nassign {target} = {value};"
+            Params: target, value (List of Token)
+        '''
+        return _ASSIGN_HEAD + target + _ASSIGN_EQUALS + value + _ASSIGN_END
+
+    def _renamed_port(self, instance_name, port):
+        ''' Returns the tokens (List of Token) of the name of port in an instance of its module.
+            Ports are identifiers, so the renamed port needs no lexing '''
+        return [Token(self._prefix_name(instance_name, port), TokenType.IDENTIFIER)]
+
+    def _lexed(self, text):
+        ''' Returns the tokens (List of Token) of a connection or port name. The tokens of recent
+            texts are kept in a bounded cache and shared by the statements using them '''
+        tokens = self._lexed_texts.get(text)
+        if tokens is None:
+            if self.word_regex.fullmatch(text):
+                tokens = [Token(text, self.tokenizer.select_type(text))]
+            else:
+                tokens = self.tokenizer.tokenize(text)
+            self._lexed_texts.put(text, tokens)
+        return tokens
+
+    def _get_template(self, module_name):
+        ''' Returns the ModuleTemplate of module_name, compiling it on first use '''
+        template = self._templates.get(module_name)
+        if template is None:
+            template = self._compile_template(module_name)
+            self._templates[module_name] = template
+        return template
+
+    def _compile_template(self, module_name):
+        ''' Splits the inlined body of module_name into statements and analyses each of them
+            once for all the instances of the module.
+            Returns: ModuleTemplate
+            Pre-conditions: module_name has already been inlined
+        '''
+        body = self._inlined_modules[module_name].body
+        parts = body.parts if isinstance(body, InlinedBody) else [body]
+        template_parts = []
+        run = [] # Statements shared by all instances, not yet added to template_parts
+        buffer = []
+        output_regs = []
+        output_wires = []
+        ended = False
+        for part in parts:
+            if ended:
+                break
+            if isinstance(part, InstanceRef):
+                # The tokens since the last statement precede an instantiation and declare nothing
+                run.extend(buffer)
+                buffer = []
+                if run:
+                    template_parts.append(InlinedBody([run]))
+                    run = []
+                template_parts.append(part)
+                continue
+            for token in part:
+                if token.content == 'endmodule':
+                    ended = True
+                    break
+                buffer.append(token)
+                # End of a statement, process it
+                if buffer[-1].content == ";":
+                    compiled = self._compile_statement(buffer, output_regs, output_wires)
+                    if isinstance(compiled, list):
+                        run.extend(compiled)
+                    else:
+                        if run:
+                            template_parts.append(InlinedBody([run]))
+                            run = []
+                        template_parts.extend(compiled)
+                    buffer = [] # Empty the buffer
+        run.extend(buffer)
+        if run:
+            template_parts.append(InlinedBody([run]))
+        return ModuleTemplate(template_parts, [x.content for x in output_regs], [x.content for x in output_wires])
+
+    def _compile_statement(self, buffer, output_regs, output_wires):
+        ''' Analyses one statement (List of Token, ending with ";") of a module template.
+            Returns the rewritten statement (List of Token) if it is the same for every instance,
+            or else the slots replacing it (tuple of InputSlot or ParameterSlot). The ports
+            assigned at the end of each instance are appended to output_regs and output_wires.
+        '''
+        stmt = [x.to_string() for x in buffer if x.token_type != TokenType.COMMENT]
+        if "input" in stmt:
+            names = {x.content for x in buffer if x.token_type == TokenType.IDENTIFIER}
+            return (InputSlot(InlinedBody([self._rewrite_statement(buffer, output_regs, output_wires)]), names),)
+        if "output" not in stmt and "inout" not in stmt and "parameter" in stmt:
+            if re.match(self.param_assign_regex, "".join(stmt)):
+                slots = self._parameter_slots(buffer)
+                if slots:
+                    return slots
+        return self._rewrite_statement(buffer, output_regs, output_wires)
+
+    def _parameter_slots(self, buffer):
+        ''' Splits a parameter declaration (List of Token, ending with ";") into one
+            ParameterSlot per declared parameter, e.g. "parameter W = 8, V = 3;" into
+            "parameter W = 8" and ", V = 3;". The value of a parameter runs from its "=" to the
+            next top-level "," or to the ";", without the whitespace and comments around it.
+            Returns: tuple of ParameterSlot, or None if a declarator has no value
+        '''
+        slots = []
+        segment_start = 0 # Start of the tokens of the current slot
+        name = None # Last identifier before the "=" of the current declarator
+        start = None # Start of the value of the current declarator
+        depth = 0
+        for i, token in enumerate(buffer):
+            content = token.content
+            if token.token_type == TokenType.OPERATOR and content[0] in "([{)]}":
+                # Concatenations may be lexed as one operator, e.g. "{{" or "}}"
+                depth += sum(x in "([{" for x in content) - sum(x in ")]}" for x in content)
+            elif depth == 0 and start is None:
+                if token.token_type == TokenType.IDENTIFIER:
+                    name = content
+                elif content == "=":
+                    if name is None:
+                        return None
+                    start = i + 1
+            elif depth == 0 and content in (",", ";"):
+                if start is None:
+                    return None
+                end = i
+                while(start < end and buffer[start].token_type in _FILLER_TYPES):
+                    start += 1
+                while(end > start and buffer[end - 1].token_type in _FILLER_TYPES):
+                    end -= 1
+                # The last slot keeps the ending ";"; the others end with their value
+                segment_end = len(buffer) if content == ";" else end
+                segment = list(buffer[segment_start:segment_end])
+                comments = [x for x in buffer[start:end] if x.token_type == TokenType.COMMENT]
+                slots.append(ParameterSlot(segment, name, start - segment_start, end - segment_start, comments, InlinedBody([segment])))
+                segment_start = segment_end
+                name = None
+                start = None
+                if content == ";":
+                    break
+        if start is not None or not slots:
+            return None
+        return tuple(slots)
+
+    def _rewrite_statement(self, buffer, output_regs, output_wires):
+        ''' Rewrites the declaration keywords of one statement (List of Token, ending with ";")
+            of a module being instantiated, token by token, so its comments stay in place: input
+            declarations become wire declarations, and output declarations become wire or reg
+            declarations, whose ports are collected in output_regs and output_wires.
+            Returns the rewritten statement (List of Token)
+        '''
+        contents = [x.content for x in buffer]
+        statement = list(buffer)
+        if "input" in contents:
+            statement[contents.index("input")] = _WIRE
+        elif "output" in contents:
+            end = 0
+            if "[" in contents:
+                # Skip the size field
+                end = balanced_bounds(contents, "[", "]", contents.index("["))
+            words = [x.content for x in buffer if x.token_type not in _FILLER_TYPES]
+            if words[:2] == ["output", "reg"]:
+                del statement[contents.index("output")]
+                ports = output_regs
+            else:
+                statement[contents.index("output")] = _WIRE
+                ports = output_wires
+            ports.extend(x for x in buffer[end:] if x.token_type == TokenType.IDENTIFIER)
+        # TODO implement functionality for inout ports
+        return statement
 
     def _prefix_name(self, prefix, name):
         ''' Helper function to standardize the way variables are prefixed 
@@ -362,22 +928,26 @@ class Inliner:
         '''
         return f"_{prefix}_{name}"
 
+    def _parse_connection_list(self, connection_list, names, kind, raw_text):
+        ''' Parses the port or parameter list (List of Token) of an instantiation with
+            parse_connections, and returns the dict mapping names in the module to the
+            connected text (str). Positional lists are bound to names (List of str) in order.
+            Params: kind (str) : "port" or "parameter", raw_text (List of str) : the instantiation, for error messages
+        '''
+        try:
+            named, connections = parse_connections(connection_list)
+        except ValueError as e:
+            raise ValueError(f"Invalid {kind} list syntax detected in Inliner._parse_instantiation: {e}\n" + "".join(raw_text) +
+                f"\nCheck file {self.input_path} for proper verilog syntax.")
+        return bind_connections(named, connections, names)
+
     def _parse_positional_param_list(self, param_list, module_name):
         ''' Function to parse a positional parameter list (List of tokens) in 
             verilog syntax for a particular module, and return a dictionary
             mapping parameter names (str) to strings (str), whether they 
             represent a number, identifier, or otherwise.
         '''
-        # TODO: Add error checking
-        # Remove spaces and commas, leaving only the parameter list arguments
-        param_list = [x for x in param_list if x.token_type != TokenType.WHTSPC]
-        param_list = [x for x in param_list if x.content != ","]
-        module_params = self.modules[module_name].ports
-        assignments = {}
-        min_size = min( len(module_params), len(param_list) )
-        for i in range( min_size ):
-            assignments[ module_params[i] ] = param_list[i].to_string()
-        return assignments  
+        return bind_connections(*parse_connections(param_list), self.modules[module_name].parameters)
 
     def _parse_named_param_list(self, param_list, module_name):
         ''' Function to parse a named parameter list (List of tokens) in 
@@ -385,79 +955,135 @@ class Inliner:
             mapping parameter names (str) to strings (str), whether they 
             represent a number, identifier, or otherwise.
         '''
-        # TODO: Add error checking
-        assignments = {}
-        regex = f"\.({regexes.identifier})\((({regexes.identifier})|({regexes.number}))\)" # Consider changing group 2 to any character
-        text = "".join(list(map(lambda x : x.to_string(), param_list)))
-        period = -1
-        while("." in text[period+1:]):
-            period = text.index(".",period+1)
-            text = text[period:] # Test this
-            m = re.match(regex, text)
-            assignments[m.group(1)] = m.group(2)
-        return assignments
+        return bind_connections(*parse_connections(param_list), self.modules[module_name].parameters)
 
     def _parse_named_port_list(self, port_list, module_name):
         ''' Function to parse a named port assignment list (List of tokens) in 
             verilog syntax for a particular module, and return a dictionary
             mapping port names (str) to the connected reg or wire names (str)
         '''
-        # TODO: Add error checking
-        assignments = {}
-        regex = f"\.({regexes.s_identifier})\((.*?)\)" 
-        text = "".join(list(map(lambda x : x.to_string(), port_list)))
-        period = text.index(".")
-        text = text[period:]
-        while("." in text[1:]):
-            m = re.match(regex, text)
-            assignments[m.group(1)] = m.group(2)
-            period = text.index(".",1)
-            text = text[period:] # Test this
-        m = re.match(regex, text)
-        assignments[m.group(1)] = m.group(2) # Add the last one
-        return assignments        
+        return bind_connections(*parse_connections(port_list), self.modules[module_name].ports)
 
     def _parse_positional_port_list(self, port_list, module_name):
-        port_list = [x for x in port_list if x.token_type != TokenType.WHTSPC]
-        port_list = [x for x in port_list if x.content != ","]
-        ports = self.modules[module_name].ports
-        assignments = {}
-        min_size = min( len(ports), len(port_list) )
-        for i in range( min_size ):
-            assignments[ ports[i] ] = port_list[i].to_string()
-        return assignments  
+        ''' Function to parse a positional port assignment list (List of tokens) in
+            verilog syntax for a particular module, and return a dictionary
+            mapping port names (str) to the connected reg or wire names (str)
+        '''
+        return bind_connections(*parse_connections(port_list), self.modules[module_name].ports)
+
+    def get_closure(self, tops):
+        ''' Returns the part of the reference tree reachable from the modules in tops, i.e. the
+            modules which must be inlined to produce the inlined versions of tops.
+            Params: tops (iterable of str)
+            Returns: dict mapping str to set of str, in the order of self.reference_tree
+            Raises: ValueError if one of tops is not a module of the input file
+            Pre-conditions: _generate_reference_tree() has already been called
+        '''
+        reached = set()
+        stack = []
+        for name in tops:
+            if name not in self.reference_tree:
+                raise ValueError(f"Unknown top module in Inliner.get_closure: {name}\nCheck input file {self.input_path} for a module with this name")
+            stack.append(name)
+        while(stack):
+            name = stack.pop()
+            if name not in reached:
+                reached.add(name)
+                stack.extend(self.reference_tree[name])
+        return {name: children for name, children in self.reference_tree.items() if name in reached}
 
     def _get_inline_order(self, ref_tree):
-        rt = deepcopy(ref_tree)
-        return self._get_inline_order_helper(rt,[])
-    
-    def _get_inline_order_helper(self, ref_tree, order):
-        ''' Algorithm to identify the order in which modules will be inlined '''
-        if not ref_tree:
-            # Base case, the tree has been completely trimmed and we have the ordering
-            return order
-        else:
-            # Identify leaf nodes
-            leaves = set()
-            for name, children in ref_tree.items():
-                if not children:
-                    leaves.add(name)
-            if not leaves:
-                # There are no leaf nodes, implying a cycle must exist
-                # TODO: Throw an error when this occurs
-                pass
-            else:
-                order.extend( list(leaves) ) # Put the current leaves on the back of the order
-                # Trim the tree
-                for name, children in ref_tree.items():
-                    for child in children.copy():
-                        if child in leaves:
-                            children.remove(child)
-                for name in leaves:
-                    ref_tree.pop(name, None)
-                # Now that the tree is trimmed, execute a recursive call on the trimmed tree
-                return self._get_inline_order_helper(ref_tree, order)      
+        ''' Returns the order (List of str) in which the modules of ref_tree must be inlined '''
+        return [name for level in self.get_inline_levels(ref_tree) for name in level]
+
+    def get_inline_levels(self, ref_tree=None):
+        ''' Algorithm to identify the order in which modules will be inlined, grouped into levels.
+            Every module only references modules of earlier levels, so the modules of one level
+            can be processed independently of each other (e.g. batched or in parallel).
+            This is Kahn's algorithm: it runs in O(V+E) (plus sorting each level) without recursion,
+            and within a level the modules keep the order in which they appear in ref_tree.
+            Params: ref_tree (dict mapping str to set of str), defaults to self.reference_tree
+            Returns: List of List of str
+            Raises: ValueError naming the modules of a cycle if ref_tree contains one
+        '''
+        if ref_tree is None:
+            ref_tree = self.reference_tree
+        position = {name: i for i, name in enumerate(ref_tree)}
+        remaining = {} # Number of children of each module not yet placed in a level
+        parents = {name: [] for name in ref_tree}
+        for name, children in ref_tree.items():
+            remaining[name] = len(children)
+            for child in children:
+                parents[child].append(name)
+        levels = []
+        placed = 0
+        level = [name for name in ref_tree if not remaining[name]]
+        while(level):
+            levels.append(level)
+            placed += len(level)
+            next_level = []
+            for name in level:
+                for parent in parents[name]:
+                    remaining[parent] -= 1
+                    if not remaining[parent]:
+                        next_level.append(parent)
+            next_level.sort(key=position.__getitem__)
+            level = next_level
+        if placed != len(ref_tree):
+            cycle = self._find_cycle(ref_tree, remaining)
+            raise ValueError(f"Cyclic module references detected in Inliner.get_inline_levels: {' -> '.join(cycle)}\nCheck input file {self.input_path} for modules that instantiate themselves")
+        return levels
+
+    def _find_cycle(self, ref_tree, remaining):
+        ''' Returns the names of the modules on one reference cycle, the first one repeated at the end.
+            Params: ref_tree (dict mapping str to set of str),
+                    remaining (dict mapping str to int) : the unplaced child counts left by get_inline_levels
+        '''
+        # Every module that could not be placed references at least one other such module,
+        # so following those references from any of them must eventually revisit one
+        name = next(x for x in ref_tree if remaining[x])
+        path = []
+        seen = {}
+        while(name not in seen):
+            seen[name] = len(path)
+            path.append(name)
+            name = min(x for x in ref_tree[name] if remaining[x])
+        return path[seen[name]:] + [name]
+
+
+def pack_module(mod):
+    ''' Serializes a Module into a tuple of picklable, compact values (see unpack_module) '''
+    return (mod.name, dump_body(mod.header), dump_body(mod.body), mod.ports, mod.parameters, mod.sites, mod.references, mod.declarations)
+
+def unpack_module(packed):
+    ''' Rebuilds a Module serialized with pack_module(); its header is a TokenTable and
+        its body a TokenTable or an InlinedBody '''
+    name, header, body, ports, parameters, sites, references, declarations = packed
+    return Module(name, load_body(body), TokenTable.from_bytes(header), ports, parameters, sites, references, declarations)
+
+def _index_worker(config_path, lexer, compact, path):
+    ''' Indexes one file in a worker process of Inliner._index
+        Params: config_path, lexer (str), compact (bool) : the settings of the parent Inliner
+                path (str) : the file to index
+        Returns: List of the modules of the file, serialized with pack_module()
+    '''
+    inliner = Inliner(config_path, path, lexer, compact)
+    inliner._index_file(path)
+    return [pack_module(x) for x in inliner.modules.values()]
 
+def _inline_worker(config_path, input_path, lexer, name, modules, inlined):
+    ''' Inlines one module in a worker process of Inliner._inline
+        Params: config_path, input_path, lexer (str) : the settings of the parent Inliner
+                name (str) : the module to inline
+                modules, inlined (dict) : see Inliner._worker_input
+        Returns: the serialized inlined body (bytes), and the seconds spent inlining it (float)
+    '''
+    inliner = Inliner(config_path, input_path, lexer)
+    inliner.modules = {k: unpack_module(v) for k, v in modules.items()}
+    inliner._inlined_modules = {k: unpack_module(v) for k, v in inlined.items()}
+    start = time.perf_counter()
+    body = inliner._get_inlined_module(name).body
+    return dump_body(body), time.perf_counter() - start
 
 def balanced_bounds(strings, open_token, close_token, start=0):
     ''' An algorithm which given a list of strings = [s0, s1, ... , sn] 
@@ -0,0 +1,54 @@
+class ModuleTemplate:
+    ''' The inlined body of a module, analysed once for all of its instances.
+        parts holds, in order:
+            InlinedBody : statements which every instance copies unchanged, except for the
+                prefix of their identifiers; they are shared by all the instances
+            InstanceRef : the expansions of the modules instantiated by the module
+            InputSlot, ParameterSlot : statements which depend on the connections of an instance
+        output_regs and output_wires (List of str) name the output ports, in declaration order,
+        whose values are assigned to the connections at the end of each instance, and
+        parameters (set of str) names the parameters an instance may override.
+    '''
+
+    def __init__(self, parts, output_regs, output_wires):
+        self.parts = parts
+        self.output_regs = output_regs
+        self.output_wires = output_wires
+        self.parameters = {x.name for x in parts if isinstance(x, ParameterSlot)}
+
+
+class InputSlot:
+    ''' An input declaration, turned into a wire declaration followed by the assignments
+        of the connected values to the ports it declares '''
+
+    def __init__(self, base, names):
+        ''' The constructor
+            Params:
+                base (InlinedBody) : the wire declaration, with the comments of the statement
+                names (set of str) : the identifiers of the statement
+        '''
+        self.base = base
+        self.names = names
+
+
+class ParameterSlot:
+    ''' The declaration of one parameter, whose value an instance may override. A statement
+        declaring several parameters is split into one ParameterSlot per parameter '''
+
+    def __init__(self, buffer, name, start, end, comments, body):
+        ''' The constructor
+            Params:
+                buffer (List of Token) : the part of the statement declaring the parameter, with comments
+                name (str) : the name of the parameter
+                start, end (int) : the bounds in buffer of the default value of the parameter,
+                    which an override replaces
+                comments (List of Token) : the comments between start and end, which are kept
+                    after the value of an override
+                body (InlinedBody) : the part of the statement when the parameter is not overridden
+        '''
+        self.buffer = buffer
+        self.name = name
+        self.start = start
+        self.end = end
+        self.comments = comments
+        self.body = body
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+from types import MappingProxyType
+from scanner import operator_lexemes
+
+class LexerTable:
+    ''' The lexical tables of a configuration file (config.json), precompiled for lookups:
+            keywords, operators (frozenset of str)
+            binary_token_pairs, ternary_token_pairs (read-only mapping of str to frozenset of str) :
+                the operators, of one or two characters, which the key character extends
+            operator_lexemes (frozenset of str) : every operator lexeme the lexers can build
+                from the operators and the token pairs (see scanner.operator_lexemes)
+            digest (bytes) : SHA-256 of the configuration file
+        A LexerTable is immutable, so the one returned by load_lexer_table is shared by every
+        Tokenizer and Inliner of the process which use the same configuration file.
+    '''
+
+    __slots__ = ("keywords", "operators", "binary_token_pairs", "ternary_token_pairs", "operator_lexemes", "digest")
+
+    def __init__(self, data):
+        ''' The constructor
+            Params: data (bytes) : the contents of the configuration file
+        '''
+        config_data = json.loads(data)
+        operators = frozenset(config_data["operators"])
+        binary_token_pairs = MappingProxyType({k: frozenset(v) for k, v in config_data["binary_token_pairs"].items()})
+        ternary_token_pairs = MappingProxyType({k: frozenset(v) for k, v in config_data["ternary_token_pairs"].items()})
+        singles = [x for x in operators if len(x) == 1]
+        object.__setattr__(self, "keywords", frozenset(config_data["keywords"]))
+        object.__setattr__(self, "operators", operators)
+        object.__setattr__(self, "binary_token_pairs", binary_token_pairs)
+        object.__setattr__(self, "ternary_token_pairs", ternary_token_pairs)
+        object.__setattr__(self, "operator_lexemes", frozenset(operator_lexemes(singles, binary_token_pairs, ternary_token_pairs)))
+        object.__setattr__(self, "digest", hashlib.sha256(data).digest())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LexerTable objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("LexerTable objects are immutable")
+
+
+_tables = {} # Maps the absolute path, modification time and size of a configuration file to its LexerTable
+
+def load_lexer_table(config_path):
+    ''' Returns the LexerTable of the configuration file config_path. The file is only read
+        and compiled the first time, and again if it changes; later calls share that table.
+    '''
+    stat = os.stat(config_path)
+    key = (os.path.abspath(config_path), stat.st_mtime_ns, stat.st_size)
+    table = _tables.get(key)
+    if table is None:
+        with open(config_path, "rb") as f:
+            table = LexerTable(f.read())
+        _tables[key] = table
+    return table
@@ -0,0 +1,50 @@
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+class LRUCache:
+    ''' A bounded mapping which evicts its least recently used entry once it holds
+        maxsize entries, and counts the hits and misses of its lookups '''
+
+    def __init__(self, maxsize):
+        if maxsize < 1:
+            raise ValueError("LRUCache maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        ''' Returns the value stored for key, marking it as most recently used,
+            or default if the key is not cached '''
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        ''' Stores value for key, evicting the least recently used entry if the cache is full '''
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def info(self):
+        ''' Returns the statistics of the cache as a CacheInfo(hits, misses, maxsize, currsize) '''
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        ''' Removes every entry and resets the statistics '''
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
@@ -0,0 +1,94 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+from inlined_body import InlinedBody, InstanceRef
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+class InlineMetrics:
+    ''' Measurements of one run of Inliner.inline, filled in while the run progresses:
+            phases : dict mapping each phase name (str) to its wall_seconds, cpu_seconds and
+                peak_rss_kb, the peak resident memory of the process at the end of the phase
+            totals : dict of the sizes of the design (input_tokens, modules, inlined_modules,
+                instances, output_tokens), and the specialization_hits and specialization_misses
+                of the specialization cache of the inliner in this process (see Inliner._specialize)
+            modules : dict mapping each inlined module name (str) to its seconds (time spent
+                inlining it), instances (number of instantiations it contains), input_tokens,
+                output_tokens (tokens of its flattened body), cached (bool, True if its body
+                was read from the inline cache), and estimated_tokens and estimated_instances,
+                its size predicted before inlining (see Inliner.estimate_sizes)
+        The CPU time of a phase only counts the current process, not its worker processes.
+    '''
+
+    def __init__(self, callback=None):
+        ''' The constructor
+            Params:
+                callback (function (str, InlineMetrics) -> None) : called at the end of each
+                    phase with the name of the phase and these metrics
+        '''
+        self.callback = callback
+        self.phases = {}
+        self.totals = {}
+        self.modules = {}
+
+    @contextmanager
+    def phase(self, name):
+        ''' Measures the phase name while the body of the with statement runs '''
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        yield
+        self.phases[name] = {"wall_seconds": time.perf_counter() - wall, "cpu_seconds": time.process_time() - cpu,
+            "peak_rss_kb": peak_rss_kb()}
+        if self.callback:
+            self.callback(name, self)
+
+    def module(self, name):
+        ''' Returns the dict of the metrics of the module name, creating it if needed '''
+        if name not in self.modules:
+            self.modules[name] = {"seconds": 0.0, "instances": 0, "input_tokens": 0, "output_tokens": 0, "cached": False,
+                "estimated_tokens": 0, "estimated_instances": 0}
+        return self.modules[name]
+
+    def to_dict(self):
+        ''' Returns the metrics as a dict of JSON serializable values '''
+        return {"phases": self.phases, "totals": self.totals, "modules": self.modules}
+
+    def write(self, path):
+        ''' Writes the metrics to the file at path as a JSON report '''
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+
+def peak_rss_kb():
+    ''' Returns the peak resident set size of the process so far, in KB, or None if the
+        platform does not report it '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform == "darwin" else peak # macOS reports bytes, Linux KB
+
+def flattened_length(body, lengths):
+    ''' Returns the number of tokens body (List of Token, TokenTable or InlinedBody) yields
+        once flattened, without flattening it. The expansions an InlinedBody shares are
+        counted once: lengths (dict) memoizes the result of every InlinedBody by id, and
+        should be shared between the calls on bodies of the same design.
+    '''
+    if not isinstance(body, InlinedBody):
+        return len(body)
+    # Children before parents, with an explicit stack so deep hierarchies do not hit the recursion limit
+    stack = [body]
+    while(stack):
+        current = stack[-1]
+        if id(current) in lengths:
+            stack.pop()
+            continue
+        unknown = [x.body for x in current.parts if isinstance(x, InstanceRef) and id(x.body) not in lengths]
+        if unknown:
+            stack.extend(unknown)
+            continue
+        stack.pop()
+        lengths[id(current)] = sum(lengths[id(x.body)] if isinstance(x, InstanceRef) else len(x) for x in current.parts)
+    return lengths[id(body)]
@@ -2,10 +2,12 @@
 class Module:
     ''' A python class to store the data of a verilog module '''
 
-    def __init__(self, name ="", body=[], header = [], ports=[], parameters=[]):
+    def __init__(self, name ="", body=[], header = [], ports=[], parameters=[], sites=[], references=set(), declarations=[]):
         self.name = name # Name of module
         self.header = header # Tokens of module header, pre-processed
         self.body = body # Tokens of module body, pre-processed
         self.ports = ports # List of ports by name (str), in declaration order
-        self.parameters = parameters # List of parameters by name (str)
-        
\ No newline at end of file
+        self.parameters = parameters # List of parameters by name (str), from the header and the body
+        self.sites = sites # Offsets into body of the identifiers which may start a module instantiation, in order
+        self.references = references # Set of the identifiers (str) found at sites
+        self.declarations = declarations # (start, end) offsets into body of each declaration statement, end excluded
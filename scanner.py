@@ -0,0 +1,287 @@
+import re
+from array import array
+from itertools import chain, repeat
+import regexes
+from tokens import Token, TokenType
+from token_table import ByteTokenTable
+
+# Types of the tokens after which the character engine holds an empty buffer, as it does at
+# the start of the input, and so yields an EMPTY_STRING token if a string starts
+_FLUSHED = frozenset((TokenType.WHTSPC, TokenType.STRING, TokenType.COMMENT))
+
+# The type codes of a ByteTokenTable; reading the value of an enum member is comparatively slow
+_CODES = {x: x.value for x in TokenType}
+
+# The UTF-8 encodings of the characters for which str.isspace() holds
+_UTF8_SPACE = "(?:[\\t-\\r\\x1c-\\x20]|\\xc2[\\x85\\xa0]|\\xe1\\x9a\\x80|\\xe2\\x80[\\x80-\\x8a\\xa8\\xa9\\xaf]|\\xe2\\x81\\x9f|\\xe3\\x80\\x80)"
+
+class RegexScanner:
+    ''' A lexer backend which recognises every lexeme with a single compiled
+        alternation of named groups instead of walking the input one character
+        at a time. The master regex is generated from the operator tables of the
+        configuration, and the scanner reproduces the token stream produced by
+        Tokenizer's character engine, including its quirks (single character
+        WHTSPC tokens, the EMPTY_STRING token preceding a string literal, etc.)
+    '''
+
+    word_memo_size = 1 << 16 # Words whose type tokenize_bytes remembers before starting over
+
+    def __init__(self, operators, keywords, binary_token_pairs, ternary_token_pairs, fallback, cache=None, lexemes=None):
+        ''' The constructor
+            Params:
+                operators (iterable of str), keywords (iterable of str),
+                binary_token_pairs (dict), ternary_token_pairs (dict) : the tables loaded from config.json
+                fallback (function str -> TokenType) : classifier used for lexemes the scanner cannot type itself
+                cache (LRUCache) : optional cache of word classifications, shared with the Tokenizer
+                lexemes (iterable of str) : the operator_lexemes() of the tables, if already known
+        '''
+        self.operators = frozenset(operators)
+        self.keywords = frozenset(keywords)
+        self.fallback = fallback
+        self.cache = cache
+        singles = [op for op in self.operators if len(op) == 1]
+        if lexemes is None:
+            lexemes = operator_lexemes(singles, binary_token_pairs, ternary_token_pairs)
+        ends = "\"`" + "".join(re.escape(c) for c in sorted(singles))
+        # Characters that end a run of identifier/number characters
+        delims = "[^\\s" + ends + "]"
+        self.master = re.compile(master_pattern(lexemes, self.operators, "\\s", delims + "*", delims + "+"))
+        # The same alternation over UTF-8 bytes, for inputs lexed in place (see tokenize_bytes).
+        # In a bytes pattern \s only matches ASCII whitespace, so the other characters for which
+        # str.isspace() holds are spelt out as UTF-8 sequences; the lead bytes of these
+        # sequences only end a run when they start one of them
+        lead = "\\xc2\\xe1\\xe2\\xe3"
+        byte_delims = "[^\\t-\\r\\x1c-\\x20" + ends + lead + "]"
+        byte_lead = f"(?!{_UTF8_SPACE})[{lead}]"
+        byte_run = f"{byte_delims}*(?:{byte_lead}{byte_delims}*)*"
+        self.master_bytes = re.compile(master_pattern(lexemes, self.operators, _UTF8_SPACE, byte_run,
+            f"(?:{byte_delims}|{byte_lead}){byte_run}").encode("utf-8"))
+        # Tokens are immutable, so the lexemes whose tokens never depend on their context share
+        # prebuilt ones: the keywords, the operators, and the usual runs of whitespace, one
+        # token per character
+        self.fixed_tokens = {x: Token(x, TokenType.KEYWORD) for x in self.keywords}
+        self.fixed_tokens.update((x, Token(x, TokenType.OPERATOR)) for x in lexemes if x in self.operators and x not in self.keywords)
+        whitespace = {x: Token(x, TokenType.WHTSPC) for x in " \t\n\r"}
+        runs = [" " * n for n in range(1, 33)] + ["\t" * n for n in range(1, 9)]
+        runs += ["\n" + x for x in runs] + ["\r\n" + x for x in runs] + ["\t", "\r", "\n", "\r\n", "\n\n", "\r\n\r\n"]
+        self.whitespace_tokens = {x: tuple(whitespace[c] for c in x) for x in runs}
+        # The same lexemes for tokenize_bytes, except the runs of whitespace
+        self.fixed_codes = {x.encode("utf-8"): y.token_type.value for x, y in self.fixed_tokens.items()}
+        self.fixed_codes.update((x.encode("utf-8"), TokenType.WHTSPC.value) for x in whitespace)
+        # Classifies a whole word in one fullmatch, in the same precedence as Tokenizer.select_type
+        self.word_types = re.compile("|".join([
+            f"(?P<NUMBER>{regexes.s_number})",
+            f"(?P<COMP_DIRECTIVE>{regexes.s_comp_dir})",
+            f"(?P<SYS_TASK>{regexes.s_sys_task})",
+            f"(?P<IDENTIFIER>{regexes.s_identifier})",
+        ]))
+
+    def tokenize(self, text):
+        ''' Takes a string and tokenizes it according to verilog syntax '''
+        return list(self.tokenize_stream((text,)))
+
+    def tokenize_stream(self, chunks):
+        ''' Takes an iterable of strings and lazily yields the tokens of their concatenation.
+            The last match of each chunk may continue in the next one, so it is scanned again
+            together with the following chunk
+            Params: chunks (iterable of str)
+            Returns: generator of Token
+        '''
+        fixed_tokens = self.fixed_tokens
+        whitespace_tokens = self.whitespace_tokens
+        finditer = self.master.finditer
+        flushed = True # Whether the character engine would hold an empty buffer, see _FLUSHED
+        pending = ""
+        for chunk in chain(chunks, (None,)):
+            if chunk is None:
+                # The end of the input, which no match can continue past
+                text, length = pending, -1
+            else:
+                text = pending + chunk
+                length = len(text)
+            pending = ""
+            for m in finditer(text):
+                if m.end() == length:
+                    pending = text[m.start():]
+                    break
+                lexeme = m.group()
+                token = fixed_tokens.get(lexeme)
+                if token is not None:
+                    flushed = False
+                    yield token
+                    continue
+                tokens = whitespace_tokens.get(lexeme)
+                if tokens is not None:
+                    flushed = True
+                    yield from tokens
+                    continue
+                kind = m.lastgroup
+                if kind == "WHTSPC":
+                    flushed = True
+                    yield from self._whitespace_tokens(lexeme)
+                    continue
+                if kind == "COMMENT":
+                    token_type = TokenType.COMMENT
+                else:
+                    if lexeme[0] == "\"" and flushed:
+                        # The character engine flushes its (empty) buffer when a string starts
+                        yield Token("", TokenType.EMPTY_STRING)
+                    token_type = TokenType.STRING if kind == "STRING" else self.classify_word(lexeme)
+                flushed = token_type in _FLUSHED
+                yield Token(lexeme, token_type)
+
+    def tokenize_bytes(self, data):
+        ''' Tokenizes UTF-8 encoded text in place, producing the same tokens as tokenize_stream.
+            No Token is built and no lexeme copied: the table only records the offsets of the
+            tokens into data, and a lexeme is decoded only when it must be classified. As when
+            a file is read in text mode, "\\r\\n" line ends make the same tokens as "\\n".
+            Params: data (bytes, or a buffer such as an mmap)
+            Returns: ByteTokenTable
+        '''
+        offset_code = "I" if len(data) <= 0xFFFFFFFF else "Q"
+        types = array("B")
+        starts = array(offset_code)
+        ends = array(offset_code)
+        append_type = types.append
+        append_start = starts.append
+        append_end = ends.append
+        fixed = self.fixed_codes
+        whtspc = TokenType.WHTSPC.value
+        comment = TokenType.COMMENT.value
+        string = TokenType.STRING.value
+        words = {} # Codes of the words seen so far, which spare decoding them again
+        flushed = True # Whether the character engine would hold an empty buffer, see _FLUSHED
+        for m in self.master_bytes.finditer(data):
+            lexeme = m.group()
+            code = fixed.get(lexeme)
+            if code is not None:
+                flushed = code == whtspc
+                start, end = m.span()
+                append_type(code)
+                append_start(start)
+                append_end(end)
+                continue
+            kind = m.lastgroup
+            start, end = m.span()
+            if kind == "WHTSPC":
+                # A run of whitespace, one token per character
+                flushed = True
+                if lexeme.isascii() and b"\r\n" not in lexeme:
+                    types.extend(repeat(whtspc, end - start))
+                    starts.extend(range(start, end))
+                    ends.extend(range(start + 1, end + 1))
+                else:
+                    run = lexeme.decode("utf-8")
+                    for j, c in enumerate(run):
+                        if c == "\r" and run[j + 1:j + 2] == "\n":
+                            # Text mode reads "\r\n" as "\n", so the "\r" makes no token
+                            start += 1
+                            continue
+                        append_type(whtspc)
+                        append_start(start)
+                        start += len(c.encode("utf-8"))
+                        append_end(start)
+                continue
+            if kind == "COMMENT":
+                code = comment
+                if lexeme[-1] == 0x0D and data[end:end + 1] == b"\n":
+                    # The "\r" of the "\r\n" ending a line comment, see above
+                    end -= 1
+            else:
+                if kind == "STRING":
+                    code = string
+                else:
+                    code = words.get(lexeme)
+                    if code is None:
+                        if len(words) >= self.word_memo_size:
+                            words.clear()
+                        code = words[lexeme] = _CODES[self.classify_word(lexeme.decode("utf-8"))]
+                if lexeme[0] == 0x22 and flushed:
+                    # The character engine flushes its (empty) buffer when a string starts
+                    append_type(TokenType.EMPTY_STRING.value)
+                    append_start(start)
+                    append_end(start)
+            flushed = code == comment or code == string
+            append_type(code)
+            append_start(start)
+            append_end(end)
+        return ByteTokenTable(data, types, starts, ends)
+
+    def _whitespace_tokens(self, run):
+        ''' Returns the tokens (tuple of Token) of a run of whitespace, one per character,
+            as the character engine produces them '''
+        return tuple(Token(c, TokenType.WHTSPC) for c in run)
+
+    def classify_word(self, word):
+        ''' Returns the TokenType of a lexeme containing no whitespace or operator characters '''
+        if self.cache is None:
+            return self._classify_word(word)
+        token_type = self.cache.get(word)
+        if token_type is None:
+            token_type = self._classify_word(word)
+            self.cache.put(word, token_type)
+        return token_type
+
+    def _classify_word(self, word):
+        if word in self.keywords:
+            return TokenType.KEYWORD
+        m = self.word_types.fullmatch(word)
+        if m:
+            return TokenType[m.lastgroup]
+        return self.fallback(word)
+
+
+def master_pattern(lexemes, operators, space, run, word):
+    ''' Returns the master regex of a RegexScanner, an alternation of named groups
+        Params:
+            lexemes (iterable of str) : the operator lexemes (see operator_lexemes)
+            operators (set of str) : the operators of the configuration
+            space (str) : the regex of one whitespace character; runs of them make one match
+            run, word (str) : the regexes of a possibly empty and of a non empty run of
+                characters which are neither whitespace nor operators
+    '''
+    operator_alternatives = []
+    singles = []
+    for lexeme in sorted(lexemes, key=lambda x: (-len(x), x)):
+        if len(lexeme) == 1 and lexeme in operators:
+            singles.append(re.escape(lexeme))
+        elif lexeme in operators:
+            operator_alternatives.append(re.escape(lexeme))
+        else:
+            # The character engine keeps appending to a buffer that is not a known
+            # operator (e.g. "*/") until it reaches a delimiter
+            operator_alternatives.append(re.escape(lexeme) + run)
+    if singles:
+        # The single characters come after the longer lexemes, so one class matches them all
+        operator_alternatives.append("[" + "".join(singles) + "]")
+    return "|".join([
+        # No other group can start where these two do, so trying them first changes no match
+        f"(?P<WHTSPC>(?:{space})+)",
+        f"(?P<WORD>{word})",
+        "(?P<COMMENT>//[^\\n]*|/\\*(?:/|[\\s\\S]*?\\*/))",
+        "(?P<STRING>\"[^\"]*(?:(?<=\\\\)\"[^\"]*)*(?<!\\\\)\")",
+        # Comments and strings running to the end of the input
+        "(?P<UNTERMINATED>/\\*[\\s\\S]*|\"[\\s\\S]*)",
+        f"(?P<OPERATOR>{'|'.join(operator_alternatives)})",
+        f"(?P<COMP_DIRECTIVE>`{run})",
+    ])
+
+def operator_lexemes(singles, binary_token_pairs, ternary_token_pairs):
+    ''' Returns the set of operator lexemes which the character engine can build
+        from the single character operators and the token pair tables.
+        A lexeme grows by a character c when c appears in ternary_token_pairs and the
+        lexeme is listed for it, or, failing that, when it does so in binary_token_pairs.
+    '''
+    lexemes = set(singles)
+    frontier = list(singles)
+    while(frontier):
+        lexeme = frontier.pop()
+        for c in singles:
+            if c in ternary_token_pairs:
+                grows = lexeme in ternary_token_pairs[c]
+            else:
+                grows = lexeme in binary_token_pairs.get(c, [])
+            if grows and lexeme + c not in lexemes:
+                lexemes.add(lexeme + c)
+                frontier.append(lexeme + c)
+    return lexemes
@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from batch import load_manifest, run_batch
+from inline import run
+
+class TestBatch(unittest.TestCase):
+
+    design = "module leaf(a, y);\n    input a;\n    output y;\n    assign y = ~a;\nendmodule\n" \
+        "module top{0}(a, y);\n    input a;\n    output y;\n    wire t;\n    leaf l0 (a, t);\n    leaf l1 (.a(t), .y(y));\nendmodule\n"
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.jobs = []
+        for i in range(4):
+            path = os.path.join(self.dir, f"design{i}.v")
+            with open(path, "w") as f:
+                f.write(self.design.format(i))
+            self.jobs.append({"input": path, "output": os.path.join(self.dir, f"out{i}.v"), "tops": [f"top{i}"] if i % 2 else None})
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def expected(self, job):
+        output = os.path.join(self.dir, "expected.v")
+        run("config.json", job["input"], output, job["tops"])
+        with open(output) as f:
+            return f.read()
+
+    def test_outputs(self):
+        completed = []
+        summary = run_batch("config.json", self.jobs, workers=2, callback=completed.append)
+        self.assertEqual((4, 4, 0), (summary["jobs"], summary["ok"], summary["failed"]))
+        self.assertEqual([0, 1, 2, 3], sorted(x["index"] for x in completed))
+        self.assertEqual([0, 1, 2, 3], [x["index"] for x in summary["results"]])
+        for job, result in zip(self.jobs, summary["results"]):
+            self.assertEqual(("ok", job["output"]), (result["status"], result["output"]))
+            self.assertGreater(result["seconds"], 0)
+            with open(job["output"]) as f:
+                self.assertEqual(self.expected(job), f.read())
+
+    def test_failures(self):
+        self.jobs[1]["tops"] = ["missing"]
+        self.jobs[2]["input"] = os.path.join(self.dir, "missing.v")
+        summary = run_batch("config.json", self.jobs, workers=2)
+        self.assertEqual(["ok", "error", "error", "ok"], [x["status"] for x in summary["results"]])
+        self.assertIn("missing", summary["results"][1]["error"])
+        self.assertEqual(2, summary["failed"])
+
+    @unittest.skipUnless(hasattr(os, "mkfifo"), "requires named pipes")
+    def test_timeout(self):
+        # Opening a named pipe without a writer blocks until the job is killed
+        fifo = os.path.join(self.dir, "blocked.v")
+        os.mkfifo(fifo)
+        self.jobs[0]["input"] = fifo
+        summary = run_batch("config.json", self.jobs, workers=2, timeout=0.5)
+        self.assertEqual(["timeout", "ok", "ok", "ok"], [x["status"] for x in summary["results"]])
+        self.assertGreaterEqual(summary["results"][0]["seconds"], 0.5)
+
+    def test_manifest(self):
+        path = os.path.join(self.dir, "manifest.json")
+        with open(path, "w") as f:
+            json.dump(self.jobs, f)
+        self.assertEqual(self.jobs, load_manifest(path))
+        with open(path, "w") as f:
+            f.write("\n".join(json.dumps(x) for x in self.jobs) + "\n")
+        self.assertEqual(self.jobs, load_manifest(path))
+        with open(path, "w") as f:
+            json.dump([{"input": "a.v"}], f)
+        with self.assertRaises(ValueError):
+            load_manifest(path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from connections import parse_connections, bind_connections
+from tokenizer import Tokenizer
+
+class TestConnections(unittest.TestCase):
+
+    def setUp(self):
+        self.tokenizer = Tokenizer("config.json")
+
+    def parse(self, text):
+        return parse_connections(self.tokenizer.tokenize(text))
+
+    def test_named(self):
+        self.assertEqual((True, [("a", "x"), ("b", "y[3:0]"), ("c", "")]), self.parse(".a(x), .b( y[3:0] ), .c()"))
+
+    def test_positional(self):
+        self.assertEqual((False, ["x", "y[3]", "", "8'hff"]), self.parse("x, y[3], , 8'hff"))
+        self.assertEqual((False, []), self.parse(""))
+
+    def test_expressions(self):
+        named, connections = self.parse(".a({b[1], c[2:0]} & (d | f(e))), /* skip */ .g(h.i)")
+        self.assertEqual([("a", "{b[1],c[2:0]}&(d|f(e))"), ("g", "h.i")], connections)
+        named, connections = self.parse("{a, b}, (c + (d >> 1)), top.u0.s")
+        self.assertEqual(["{a,b}", "(c+(d>>1))", "top.u0.s"], connections)
+
+    def test_bind(self):
+        self.assertEqual({"p": "x", "q": "y"}, bind_connections(*self.parse("x, y, z"), ["p", "q"]))
+        self.assertEqual({"q": "y", "p": "x"}, bind_connections(*self.parse(".q(y), .p(x)"), ["p", "q"]))
+
+    def test_errors(self):
+        for text in (".a(x), y", "x, .a(y)", ".a(x", ".a(x))", ".a x", ".a(x) .b(y)", ".a(x),", "x, (y]", "x)", ".(x)"):
+            with self.assertRaises(ValueError, msg=text):
+                self.parse(text)
+
+    def test_linear(self):
+        entries = 10000
+        named, connections = self.parse(", ".join(f".p{i}({{a[{i}], b}})" for i in range(entries)))
+        self.assertEqual(entries, len(connections))
+        self.assertEqual(("p1234", "{a[1234],b}"), connections[1234])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from daemon import InlinerDaemon, serve_stream
+from inline import run
+
+class TestInlinerDaemon(unittest.TestCase):
+
+    files = {
+        "leaf.v": "module leaf(a, y);\n    input a;\n    output y;\n    assign y = ~a;\nendmodule\n",
+        "mid.v": "module mid(a, y);\n    input a;\n    output y;\n    wire t;\n    leaf l0 (.a(a), .y(t));\n    leaf l1 (.a(t), .y(y));\nendmodule\n",
+        "other.v": "module other(a, y);\n    input a;\n    output y;\n    leaf l0 (a, y);\nendmodule\n",
+        "top.v": "module top(a, y, z);\n    input a;\n    output y, z;\n    mid m0 (.a(a), .y(y));\n    other o0 (.a(a), .y(z));\nendmodule\n",
+    }
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.design = os.path.join(self.dir, "design")
+        os.makedirs(self.design)
+        self.clock = 1000000000
+        for name, text in self.files.items():
+            self.write(name, text)
+        self.daemon = InlinerDaemon("config.json", self.design)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.design, name)
+        with open(path, "w") as f:
+            f.write(text)
+        # Make the change visible even if the file is rewritten within the timestamp resolution
+        self.clock += 1
+        os.utime(path, (self.clock, self.clock))
+
+    def expected(self, tops=None):
+        output = os.path.join(self.dir, "expected.v")
+        run("config.json", self.design, output, tops)
+        with open(output) as f:
+            return f.read()
+
+    def request(self, **request):
+        response = self.daemon.handle(request)
+        self.assertTrue(response["ok"], response.get("error"))
+        return response
+
+    def test_matches_inline(self):
+        self.assertEqual(self.expected(), self.request()["text"])
+        self.assertEqual(self.expected(["top"]), self.request(tops=["top"])["text"])
+        output = os.path.join(self.dir, "out.v")
+        self.assertEqual(["mid"], self.request(tops=["mid"], output=output)["modules"])
+        with open(output) as f:
+            self.assertEqual(self.expected(["mid"]), f.read())
+        # Every module was inlined once, by the first request
+        self.assertEqual(4, self.daemon.stats["modules_inlined"])
+
+    def test_only_changed_modules_inlined_again(self):
+        self.request(tops=["top"])
+        inlined = dict(self.daemon.inliner._inlined_modules)
+        self.write("other.v", self.files["other.v"].replace("    leaf", "    // edited\n    leaf"))
+        self.assertEqual({"other"}, self.daemon.refresh())
+        self.assertEqual({"leaf", "mid"}, set(self.daemon.inliner._inlined_modules))
+        self.assertEqual(self.expected(["top"]), self.request(tops=["top"])["text"])
+        self.assertIs(inlined["mid"], self.daemon.inliner._inlined_modules["mid"])
+        self.assertIsNot(inlined["top"], self.daemon.inliner._inlined_modules["top"])
+        # Rewriting a file with the same modules changes nothing
+        self.write("leaf.v", self.files["leaf.v"])
+        self.assertEqual(set(), self.daemon.refresh())
+        self.assertIs(inlined["mid"], self.daemon.inliner._inlined_modules["mid"])
+
+    def test_added_and_removed_files(self):
+        self.request()
+        os.unlink(os.path.join(self.design, "other.v"))
+        self.write("extra.v", "module extra(a, y);\n    input a;\n    output y;\n    mid m0 (.a(a), .y(y));\nendmodule\n")
+        self.assertEqual({"other", "extra"}, self.daemon.refresh())
+        self.assertNotIn("other", self.daemon.inliner.modules)
+        self.assertEqual(self.expected(["extra"]), self.request(tops=["extra"])["text"])
+        self.assertEqual(self.expected(), self.request()["text"])
+
+    def test_errors(self):
+        self.request()
+        response = self.daemon.handle({"id": 7, "tops": ["missing"]})
+        self.assertEqual((7, False), (response["id"], response["ok"]))
+        self.assertIn("missing", response["error"])
+        # A duplicate module fails the request, and the daemon recovers once it is fixed
+        self.write("copy.v", self.files["leaf.v"])
+        self.assertFalse(self.daemon.handle({})["ok"])
+        os.unlink(os.path.join(self.design, "copy.v"))
+        self.assertEqual(self.expected(), self.request()["text"])
+
+    def test_serve_stream(self):
+        stream_in = io.StringIO('{"id": 1, "tops": ["mid"]}\n\nnot json\n{"id": 2, "op": "stats"}\n')
+        stream_out = io.StringIO()
+        serve_stream(self.daemon, stream_in, stream_out)
+        responses = [json.loads(x) for x in stream_out.getvalue().splitlines()]
+        self.assertEqual([1, None, 2], [x["id"] for x in responses])
+        self.assertEqual([True, False, True], [x["ok"] for x in responses])
+        self.assertEqual(self.expected(["mid"]), responses[0]["text"])
+        self.assertEqual(1, responses[2]["stats"]["requests"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from inliner import Inliner, pack_module
+from index_cache import IndexCache, dump_modules, load_modules
+
+class TestIndexCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.design = os.path.join(self.dir, "design")
+        os.makedirs(self.design)
+        shutil.copy("sample.vl", os.path.join(self.design, "sample.vl"))
+        with open(os.path.join(self.design, "extra.v"), "w") as f:
+            f.write("module extra(a, y);\n    input a;\n    output y;\n    flop u0 (.clk(a), .rst_n(a), .d(a), .q(y));\nendmodule\n")
+        self.cache_dir = os.path.join(self.dir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def index(self, **kwargs):
+        inliner = Inliner("config.json", self.design, cache_dir=self.cache_dir, **kwargs)
+        inliner._index()
+        return inliner
+
+    def assertSameModules(self, expected, actual):
+        self.assertEqual(list(expected.modules), list(actual.modules))
+        for name, mod in expected.modules.items():
+            other = actual.modules[name]
+            self.assertEqual([(x.content, x.token_type) for x in mod.header], [(x.content, x.token_type) for x in other.header])
+            self.assertEqual([(x.content, x.token_type) for x in mod.body], [(x.content, x.token_type) for x in other.body])
+            for attribute in ("ports", "parameters", "sites", "references", "declarations"):
+                self.assertEqual(getattr(mod, attribute), getattr(other, attribute))
+        self.assertEqual(expected.module_paths, actual.module_paths)
+
+    def test_round_trip(self):
+        inliner = Inliner("config.json", "sample.vl")
+        inliner._index()
+        packed = [pack_module(x) for x in inliner.modules.values()]
+        self.assertEqual(packed, load_modules(dump_modules(packed)))
+        with self.assertRaises(ValueError):
+            load_modules(dump_modules(packed)[:-1])
+
+    def test_reuse(self):
+        expected = Inliner("config.json", self.design)
+        expected._index()
+        first = self.index()
+        self.assertEqual((0, 2), (first.index_cache.hits, first.index_cache.misses))
+        self.assertSameModules(expected, first)
+        second = self.index(compact=True)
+        self.assertEqual((2, 0), (second.index_cache.hits, second.index_cache.misses))
+        self.assertSameModules(expected, second)
+
+    def test_changed_file_is_indexed_again(self):
+        self.index()
+        with open(os.path.join(self.design, "extra.v"), "a") as f:
+            f.write("module more;\nendmodule\n")
+        inliner = self.index()
+        self.assertEqual((1, 1), (inliner.index_cache.hits, inliner.index_cache.misses))
+        self.assertEqual(["more"], inliner.file_modules[os.path.join(self.design, "extra.v")][1:])
+
+    def test_missing_entry(self):
+        cache = IndexCache(self.cache_dir)
+        self.assertIsNone(cache.load("key"))
+        cache.store("key", [])
+        self.assertEqual([], cache.load("key"))
+
+    def test_truncated_entry_is_indexed_again(self):
+        expected = self.index()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(IndexCache.suffix):
+                path = os.path.join(self.cache_dir, name)
+                with open(path, "rb") as f:
+                    data = f.read()
+                with open(path, "wb") as f:
+                    f.write(data[:7])
+        inliner = self.index()
+        self.assertEqual((0, 2), (inliner.index_cache.hits, inliner.index_cache.misses))
+        self.assertSameModules(expected, inliner)
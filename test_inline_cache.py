@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+from inliner import Inliner
+from inline_cache import InlineCache
+from tokenizer import Tokenizer
+from token_table import TokenTable
+
+class TestInlineCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.design = os.path.join(self.dir, "design.v")
+        shutil.copy("sample.vl", self.design)
+        self.cache_dir = os.path.join(self.dir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def inline(self, cache_dir=None):
+        inliner = Inliner("config.json", self.design, cache_dir=cache_dir)
+        inliner.inline(message=False)
+        text = {name: "".join([x.content for x in mod.body]) for name, mod in inliner._inlined_modules.items()}
+        return inliner, text
+
+    def test_store_and_load(self):
+        cache = InlineCache(self.cache_dir)
+        tokens = Tokenizer("config.json").tokenize("assign a = b; // c\n")
+        self.assertIsNone(cache.load("key"))
+        cache.store("key", tokens)
+        body = cache.load("key")
+        self.assertIsInstance(body, TokenTable)
+        self.assertEqual([(x.content, x.token_type) for x in tokens], [(x.content, x.token_type) for x in body])
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_truncated_entry_is_a_miss(self):
+        cache = InlineCache(self.cache_dir)
+        cache.store("key", Tokenizer("config.json").tokenize("assign a = b;"))
+        path = os.path.join(self.cache_dir, "key" + InlineCache.suffix)
+        with open(path, "rb") as f:
+            data = f.read()
+        for size in (0, 3, 6, len(data) // 2, len(data) - 1):
+            with open(path, "wb") as f:
+                f.write(data[:size])
+            self.assertIsNone(cache.load("key"))
+        self.assertEqual(5, cache.misses)
+
+    def test_only_changed_cone_is_rebuilt(self):
+        _, expected = self.inline()
+        first, text = self.inline(self.cache_dir)
+        self.assertEqual(expected, text)
+        self.assertEqual((0, 2), (first.inline_cache.hits, first.inline_cache.misses)) # alu and top reference other modules
+        second, text = self.inline(self.cache_dir)
+        self.assertEqual(expected, text)
+        self.assertEqual((2, 0), (second.inline_cache.hits, second.inline_cache.misses))
+        with open(self.design) as f:
+            source = f.read()
+        with open(self.design, "w") as f:
+            f.write(source.replace("#10 $finish;", "#20 $finish;"))
+        _, expected = self.inline()
+        third, text = self.inline(self.cache_dir)
+        self.assertEqual(expected, text)
+        self.assertEqual((1, 1), (third.inline_cache.hits, third.inline_cache.misses)) # only top changed
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from tokenizer import Tokenizer
+from token_table import TokenTable
+from inlined_body import InlinedBody, InstanceRef, dump_body, load_body
+from inliner import Inliner
+
+class TestInlinedBody(unittest.TestCase):
+
+    def setUp(self):
+        t = Tokenizer("config.json")
+        self.leaf = InlinedBody([t.tokenize("wire a; assign a = b;\n")])
+        self.body = InlinedBody([t.tokenize("wire w;\n")])
+        self.body.append_ref(InstanceRef(self.leaf, "_u0_"))
+        self.body.append_ref(InstanceRef(self.leaf, "_u1_"))
+        self.body.extend(t.tokenize("endmodule"))
+
+    def text(self, body):
+        return "".join([x.content for x in body])
+
+    def test_iteration_renames_identifiers(self):
+        self.assertEqual("wire w;\nwire _u0_a; assign _u0_a = _u0_b;\nwire _u1_a; assign _u1_a = _u1_b;\nendmodule", self.text(self.body))
+
+    def test_nested_prefixes_compose(self):
+        outer = InlinedBody()
+        outer.append_ref(InstanceRef(self.body, "_top_"))
+        self.assertEqual("wire _top_w;\nwire _top__u0_a;", self.text(outer)[:len("wire _top_w;\nwire _top__u0_a;")])
+
+    def test_round_trip_shares_expansions(self):
+        data = dump_body(self.body)
+        body = load_body(data)
+        self.assertIsInstance(body, InlinedBody)
+        self.assertEqual(self.text(self.body), self.text(body))
+        self.assertIs(body.parts[1].body, body.parts[2].body)
+        self.assertEqual(data.count(b"assign a = b;"), 1)
+
+    def test_token_lists_load_as_tables(self):
+        tokens = Tokenizer("config.json").tokenize("assign a = b;")
+        self.assertIsInstance(load_body(dump_body(tokens)), TokenTable)
+
+
+class TestSharedExpansions(unittest.TestCase):
+
+    depth = 24 # 2 ** 24 instances of the leaf module once flattened
+
+    def setUp(self):
+        modules = ["module m%d(d, q);\n    input d;\n    output q;\n    assign q = ~d;\nendmodule\n" % self.depth]
+        for i in range(self.depth):
+            modules.append(f"module m{i}(d, q);\n    input d;\n    output q;\n    wire t;\n"
+                f"    m{i + 1} u0 (.d(d), .q(t));\n    m{i + 1} u1 (.d(t), .q(q));\nendmodule\n")
+        fd, self.input = tempfile.mkstemp(suffix=".v")
+        with os.fdopen(fd, "w") as f:
+            f.write("".join(modules))
+
+    def tearDown(self):
+        os.unlink(self.input)
+
+    def test_instances_reference_one_expansion(self):
+        inliner = Inliner("config.json", self.input)
+        inliner.inline(message=False)
+        body = inliner._inlined_modules["m0"].body
+        refs = [x for x in body.parts if isinstance(x, InstanceRef)]
+        self.assertEqual(2, len(refs))
+        u0 = [x for x in refs[0].body.parts if isinstance(x, InstanceRef)]
+        u1 = [x for x in refs[1].body.parts if isinstance(x, InstanceRef)]
+        self.assertIs(u0[0].body, u1[0].body)
+        self.assertEqual(("_u0_", "_u1_"), (u0[0].prefix, u1[0].prefix))
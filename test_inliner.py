@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from inline import *
 import tokenizer
@@ -145,4 +147,352 @@ class TestInliner(unittest.TestCase):
                 print("\n")
         except:
             print("Error encountered or unexpected exception raised:")
-            raise
\ No newline at end of file
+            raise
+
+class TestParallelInlining(unittest.TestCase):
+
+    design = """module leaf(clk, d, q);
+    input clk;
+    input d;
+    output reg q;
+    always @(posedge clk) q <= d; // register
+endmodule
+module left(clk, a, y);
+    input clk;
+    input a;
+    output y;
+    leaf l0 (.clk(clk), .d(a), .q(y));
+endmodule
+module right(clk, a, y);
+    input clk;
+    input a;
+    output y;
+    wire t;
+    leaf r0 (.clk(clk), .d(a), .q(t));
+    leaf r1 (.clk(clk), .d(t), .q(y));
+endmodule
+module top(clk, a, y, z);
+    input clk;
+    input a;
+    output y, z;
+    left u_left (.clk(clk), .a(a), .y(y));
+    right u_right (.clk(clk), .a(a), .y(z));
+endmodule
+"""
+
+    def setUp(self):
+        fd, self.input = tempfile.mkstemp(suffix=".v")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.design)
+
+    def tearDown(self):
+        os.unlink(self.input)
+
+    def inlined_text(self, jobs):
+        inliner = Inliner("config.json", self.input)
+        inliner.inline(message=False, jobs=jobs)
+        return [(name, "".join([x.to_string() for x in mod.header]) + "".join([x.to_string() for x in mod.body]))
+            for name, mod in inliner._inlined_modules.items()]
+
+    def test_parallel_matches_serial(self):
+        self.assertEqual(self.inlined_text(None), self.inlined_text(2))
+
+    def test_inline_twice(self):
+        inliner = Inliner("config.json", self.input)
+        inliner.inline(message=False, tops=["left"])
+        self.assertEqual({"left", "leaf"}, set(inliner._inlined_modules))
+        inliner.inline(message=False)
+        self.assertEqual(self.inlined_text(None), [(name, "".join([x.to_string() for x in mod.header]) + "".join([x.to_string() for x in mod.body]))
+            for name, mod in inliner._inlined_modules.items()])
+
+class TestInlineOrder(unittest.TestCase):
+
+    def setUp(self):
+        self.inliner = Inliner("config.json", "sample.vl")
+
+    def test_levels(self):
+        ref_tree = {"top": {"alu", "flop"}, "alu": {"adder", "flop"}, "flop": set(), "adder": set()}
+        self.assertEqual(self.inliner.get_inline_levels(ref_tree), [["flop", "adder"], ["alu"], ["top"]])
+        self.assertEqual(self.inliner._get_inline_order(ref_tree), ["flop", "adder", "alu", "top"])
+
+    def test_sample_levels(self):
+        self.inliner._index()
+        self.inliner._generate_reference_tree()
+        self.assertEqual(self.inliner.get_inline_levels(), [["adder", "flop"], ["alu"], ["top"]])
+
+    def test_deep_chain(self):
+        # Deeper than the recursion limit
+        depth = 5000
+        ref_tree = {f"m{i}": {f"m{i + 1}"} for i in range(depth)}
+        ref_tree[f"m{depth}"] = set()
+        levels = self.inliner.get_inline_levels(ref_tree)
+        self.assertEqual(len(levels), depth + 1)
+        self.assertEqual(levels[0], [f"m{depth}"])
+        self.assertEqual(levels[-1], ["m0"])
+
+    def test_cycle(self):
+        ref_tree = {"top": {"a"}, "a": {"b"}, "b": {"c", "leaf"}, "c": {"a"}, "leaf": set()}
+        with self.assertRaises(ValueError) as cm:
+            self.inliner.get_inline_levels(ref_tree)
+        self.assertIn("a -> b -> c -> a", str(cm.exception))
+
+    def test_self_reference(self):
+        with self.assertRaises(ValueError) as cm:
+            self.inliner.get_inline_levels({"a": {"a"}})
+        self.assertIn("a -> a", str(cm.exception))
+
+class TestTopClosure(unittest.TestCase):
+
+    def setUp(self):
+        self.inliner = Inliner("config.json", "sample.vl")
+
+    def test_closure(self):
+        self.inliner._index()
+        self.inliner._generate_reference_tree()
+        self.assertEqual(list(self.inliner.get_closure(["alu"])), ["adder", "flop", "alu"])
+        self.assertEqual(list(self.inliner.get_closure(["flop", "adder"])), ["adder", "flop"])
+        self.assertEqual(self.inliner.get_closure(["top"]), self.inliner.reference_tree)
+        with self.assertRaises(ValueError):
+            self.inliner.get_closure(["missing"])
+
+    def test_inline_tops(self):
+        self.inliner.inline(message=False, tops=["alu"])
+        self.assertEqual(list(self.inliner._inlined_modules), ["adder", "flop", "alu"])
+        full = Inliner("config.json", "sample.vl")
+        full.inline(message=False)
+        self.assertEqual([x.to_string() for x in self.inliner._inlined_modules["alu"].body],
+            [x.to_string() for x in full._inlined_modules["alu"].body])
+
+class TestInstantiationSites(unittest.TestCase):
+
+    def test_sites(self):
+        inliner = Inliner("config.json", "sample.vl")
+        inliner._index()
+        alu = inliner.modules["alu"]
+        self.assertEqual(["adder", "flop"], [alu.body[x].content for x in alu.sites])
+        self.assertEqual({"adder", "flop"}, alu.references)
+        self.assertEqual({"alu"}, inliner.modules["top"].references)
+        self.assertEqual([], inliner.modules["adder"].sites)
+
+    def test_module_name_used_as_net(self):
+        fd, path = tempfile.mkstemp(suffix=".v")
+        with os.fdopen(fd, "w") as f:
+            f.write("module leaf(a, y);\n    input a;\n    output y;\n    assign y = a;\nendmodule\n"
+                "module top(leaf, y);\n    input leaf;\n    output y;\n    assign y = leaf;\nendmodule\n")
+        try:
+            inliner = Inliner("config.json", path)
+            inliner._index()
+            inliner._generate_reference_tree()
+        finally:
+            os.unlink(path)
+        self.assertEqual(set(), inliner.reference_tree["top"])
+
+class TestModuleStructure(unittest.TestCase):
+
+    def build(self, text):
+        inliner = Inliner("config.json", "sample.vl")
+        inliner._build_module(inliner.tokenizer.tokenize(text))
+        return list(inliner.modules.values())[0]
+
+    def test_ansi_header(self):
+        mod = self.build("module m #(parameter W = 8, parameter [3:0] D = W - 1) (\n"
+            "    input wire [W-1:0] a, b,\n    output reg [D:0] q\n);\n    parameter S = 2;\nendmodule")
+        self.assertEqual("m", mod.name)
+        self.assertEqual(["a", "b", "q"], mod.ports)
+        self.assertEqual(["W", "D", "S"], mod.parameters)
+        self.assertEqual(";", mod.header[-1].content)
+
+    def test_nested_parameter_defaults(self):
+        mod = self.build("module m #(parameter W = (4) * X, D = $clog2(W) + Y) (a);\n    input a;\nendmodule")
+        self.assertEqual(["W", "D"], mod.parameters)
+        self.assertEqual(["a"], mod.ports)
+
+    def test_body_parameter_list(self):
+        mod = self.build("module m(a);\n    input a;\n    parameter W = 8, M = {2{W}}, V = f(W, 3);\n"
+            "    parameter [3:0] D = W - 1;\nendmodule")
+        self.assertEqual(["W", "M", "V", "D"], mod.parameters)
+
+    def test_declarations(self):
+        mod = self.build("module m(a, q);\n    input [1:0] a; output reg q;\n    wire t = a[0];\n"
+            "    always @(*) q = t;\nendmodule")
+        self.assertEqual(["a", "q"], mod.ports)
+        self.assertEqual(["input [1:0] a;", "output reg q;", "wire t = a[0];"],
+            ["".join(x.content for x in mod.body[start:end]) for start, end in mod.declarations])
+
+class TestSizeEstimates(unittest.TestCase):
+
+    def setUp(self):
+        self.inliner = Inliner("config.json", "sample.vl")
+        self.inliner._index()
+        self.inliner._generate_reference_tree()
+
+    def test_estimates(self):
+        estimates = self.inliner.estimate_sizes()
+        self.assertEqual({"adder": 0, "flop": 0, "alu": 2, "top": 3}, {k: v["instances"] for k, v in estimates.items()})
+        self.assertEqual(len(self.inliner.modules["adder"].header) + len(self.inliner.modules["adder"].body), estimates["adder"]["tokens"])
+        self.inliner._inline()
+        for name in ("alu", "top"):
+            mod = self.inliner._inlined_modules[name]
+            actual = len(list(mod.header)) + len(list(mod.body))
+            self.assertAlmostEqual(1, estimates[name]["tokens"] / actual, delta=0.05)
+
+    def test_closure(self):
+        estimates = self.inliner.estimate_sizes(self.inliner.get_closure(["alu"]))
+        self.assertEqual(["adder", "flop", "alu"], list(estimates))
+
+    def test_budget(self):
+        with self.assertRaises(ValueError) as context:
+            Inliner("config.json", "sample.vl").inline(message=False, budget=500)
+        self.assertIn("top", str(context.exception))
+        inliner = Inliner("config.json", "sample.vl")
+        inliner.inline(message=False, budget=500, budget_action="warn")
+        self.assertIn("top", inliner._inlined_modules)
+        Inliner("config.json", "sample.vl").inline(message=False, budget=10 ** 6)
+
+class TestInputFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.write("top.v", "module top(a, y);\n    input a;\n    output y;\n    mid u0 (.a(a), .y(y));\nendmodule\n")
+        self.write("lib/mid.v", "module mid(a, y);\n    input a;\n    output y;\n    leaf u0 (.a(a), .y(y));\nendmodule\n")
+        self.write("lib/cells/leaf.vl", "module leaf(a, y);\n    input a;\n    output y;\n    assign y = ~a;\nendmodule\n")
+        self.write("lib/notes.txt", "module ignored;\nendmodule\n")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.dir.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def test_input_files(self):
+        files = [self.path("top.v"), self.path("lib/mid.v"), self.path("lib/cells/leaf.vl")]
+        self.assertEqual(files, Inliner("config.json", self.dir.name).input_files())
+        self.assertEqual(files[1::-1], Inliner("config.json", [self.path("*/*.v"), self.path("*.v"), self.path("top.v")]).input_files())
+        with self.assertRaises(ValueError):
+            Inliner("config.json", self.path("*.sv")).input_files()
+
+    def test_inline_directory(self):
+        serial = Inliner("config.json", self.dir.name)
+        serial.inline(message=False)
+        self.assertEqual(["top", "mid", "leaf"], list(serial.modules))
+        self.assertEqual(self.path("lib/mid.v"), serial.module_paths["mid"])
+        parallel = Inliner("config.json", [self.path("lib"), self.path("top.v")])
+        parallel.inline(message=False, jobs=2)
+        self.assertEqual(["mid", "leaf", "top"], list(parallel.modules))
+        self.assertEqual("".join(x.content for x in serial._inlined_modules["top"].body),
+            "".join(x.content for x in parallel._inlined_modules["top"].body))
+
+    def test_duplicate_module(self):
+        self.write("lib/copy.v", "module mid(a, y);\nendmodule\n")
+        with self.assertRaises(ValueError) as context:
+            Inliner("config.json", self.dir.name)._index()
+        self.assertIn(self.path("lib/copy.v"), str(context.exception))
+        self.assertIn(self.path("lib/mid.v"), str(context.exception))
+
+class TestInstanceTemplates(unittest.TestCase):
+
+    design = """module leaf(clk, d, q);
+    parameter W = 4; // width
+    input clk; // the clock
+    /* data */ input [W-1:0] d;
+    output reg [W-1:0] q;
+    always @(posedge clk) q <= d;
+endmodule
+module top(clk, a, y, z);
+    input clk;
+    input [3:0] a;
+    output [3:0] y, z;
+    leaf u0 (.clk(clk), .d(a), .q(y));
+    leaf u1 (.clk(clk), .d(a + 1), .q(z));
+endmodule
+"""
+
+    def setUp(self):
+        fd, self.input = tempfile.mkstemp(suffix=".v")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.design)
+        self.inliner = Inliner("config.json", self.input)
+        self.inliner.inline(message=False)
+
+    def tearDown(self):
+        os.unlink(self.input)
+
+    def test_compiled_once(self):
+        self.assertEqual(["leaf"], list(self.inliner._templates))
+        refs = [x for x in self.inliner._inlined_modules["top"].body.parts if isinstance(x, InstanceRef)]
+        u0, u1 = [[x.body for x in ref.body.parts if isinstance(x, InstanceRef)] for ref in refs]
+        self.assertEqual(len(u0), len(u1))
+        for a, b in zip(u0, u1):
+            self.assertIs(a, b)
+
+    def test_expansion(self):
+        body = self.inliner._expand_instance("leaf", "u", {"W": "8"}, {"clk": "c", "d": "x + 1", "q": "o"})
+        self.assertEqual("\n    parameter _u_W = 8; // width\n    wire _u_clk;\nassign _u_clk = c; // the clock\n"
+            "    /* data */ wire [_u_W-1:0] _u_d;\nassign _u_d = x + 1;\n     reg [_u_W-1:0] _u_q;\n"
+            "    always @(posedge _u_clk) _u_q <= _u_d;\n\nassign o = _u_q;\n", "".join([x.content for x in body]))
+
+    def test_comments_kept_in_place(self):
+        tkzr = tokenizer.Tokenizer("config.json")
+        self.inliner._inlined_modules["leaf"].body = tkzr.tokenize("\n"
+            "    parameter /*p*/ W = /*v*/ 4 /*w*/; parameter D = 1 /*x*/ + 1;\n"
+            "    input /*i*/ [W-1:0] /*j*/ d;\n    output /*o*/ reg /*r*/ [W-1:0] /*s*/ q;\nendmodule\n")
+        self.inliner._templates.clear()
+        body = self.inliner._expand_instance("leaf", "u", {"W": "2 * N", "D": "3"}, {"d": "a", "q": "b"})
+        self.assertEqual("\n    parameter /*p*/ _u_W = /*v*/ 2 * N /*w*/; parameter _u_D = 3/*x*/;\n"
+            "    wire /*i*/ [_u_W-1:0] /*j*/ _u_d;\nassign _u_d = a;\n     /*o*/ reg /*r*/ [_u_W-1:0] /*s*/ _u_q;\n"
+            "\nassign b = _u_q;\n", "".join([x.content for x in body]))
+
+    def test_multiple_parameters(self):
+        tkzr = tokenizer.Tokenizer("config.json")
+        self.inliner._inlined_modules["leaf"].body = tkzr.tokenize("\n"
+            "    parameter W = 8, /*c*/ M = {2{1'b0}}, V = W + 3;\n    input [W-1:0] d;\n")
+        self.inliner._templates.clear()
+        body = self.inliner._expand_instance("leaf", "u", {"W": "16"}, {"d": "a"})
+        self.assertEqual("\n    parameter _u_W = 16, /*c*/ _u_M = {2{1'b0}}, _u_V = _u_W + 3;\n"
+            "    wire [_u_W-1:0] _u_d;\nassign _u_d = a;\n\n", "".join([x.content for x in body]))
+        body = self.inliner._expand_instance("leaf", "u", {"V": "2", "M": "0"}, {"d": "a"})
+        self.assertEqual("\n    parameter _u_W = 8, /*c*/ _u_M = 0, _u_V = 2;\n"
+            "    wire [_u_W-1:0] _u_d;\nassign _u_d = a;\n\n", "".join([x.content for x in body]))
+
+    def test_specializations_shared(self):
+        # u0 and u1 override no parameter, so the second reuses the specialization of the first
+        self.assertEqual((1, 1), (self.inliner.metrics.totals["specialization_hits"], self.inliner.metrics.totals["specialization_misses"]))
+        a = self.inliner._expand_instance("leaf", "a", {"W": "8"}, {"clk": "c", "d": "x", "q": "o"})
+        b = self.inliner._expand_instance("leaf", "b", {"W": "8"}, {"clk": "c", "d": "y", "q": "p"})
+        self.inliner._expand_instance("leaf", "c", {"W": "2"}, {"clk": "c", "d": "y", "q": "p"})
+        info = self.inliner.specialization_info()
+        self.assertEqual((2, 3, 3), (info.hits, info.misses, info.currsize))
+        self.assertIs(a.parts[0].body, b.parts[0].body)
+        self.assertTrue("".join([x.content for x in b]).startswith("\n    parameter _b_W = 8; // width\n"))
+
+    def test_renaming_shares_tokens(self):
+        body = list(self.inliner._expand_instance("leaf", "u", {"W": "8"}, {"clk": "c", "d": "x", "q": "o"}))
+        head = list(self.inliner._specialize("leaf", {"W": "8"})[0])
+        self.assertEqual("\n    parameter _u_W = ", "".join([x.content for x in body[:len(head)]]))
+        for old, new in zip(head, body):
+            if old.token_type == TokenType.IDENTIFIER:
+                self.assertIsNot(old, new)
+            else:
+                self.assertIs(old, new)
+        # The value of the override is written in the instantiating module, so it is not renamed
+        self.assertIs(self.inliner._lexed("8")[0], body[len(head)])
+
+    def test_parameter_overrides(self):
+        positional = self.inliner._parse_positional_param_list(tokenizer.Tokenizer("config.json").tokenize("8"), "leaf")
+        self.assertEqual({"W": "8"}, positional)
+        named = self.inliner._parse_named_param_list(tokenizer.Tokenizer("config.json").tokenize(".W(8)"), "leaf")
+        self.assertEqual({"W": "8"}, named)
+
+    def test_connection_expressions(self):
+        tokens = tokenizer.Tokenizer("config.json").tokenize("leaf #(2 * N) u2 (clk, {a[1], b[0]}, y[3]);")
+        self.assertEqual(("leaf", "u2", {"W": "2*N"}, {"clk": "clk", "d": "{a[1],b[0]}", "q": "y[3]"}),
+            self.inliner._parse_instantiation(tokens))
+        with self.assertRaises(ValueError):
+            self.inliner._parse_instantiation(tokenizer.Tokenizer("config.json").tokenize("leaf u2 (.clk(clk), a);"))
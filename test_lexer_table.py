@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from lexer_table import load_lexer_table
+from scanner import operator_lexemes
+from tokenizer import Tokenizer
+from inliner import Inliner
+
+class TestLexerTable(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.dir, "config.json")
+        shutil.copy("config.json", self.config_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_tables_match_config(self):
+        with open("config.json") as f:
+            config_data = json.load(f)
+        table = load_lexer_table("config.json")
+        self.assertEqual(table.operators, set(config_data["operators"]))
+        self.assertEqual(table.keywords, set(config_data["keywords"]))
+        self.assertEqual(table.binary_token_pairs["="], set(config_data["binary_token_pairs"]["="]))
+        singles = [x for x in config_data["operators"] if len(x) == 1]
+        self.assertEqual(table.operator_lexemes,
+            operator_lexemes(singles, config_data["binary_token_pairs"], config_data["ternary_token_pairs"]))
+
+    def test_shared_by_tokenizers_and_inliners(self):
+        table = load_lexer_table(self.config_path)
+        self.assertIs(load_lexer_table(self.config_path), table)
+        self.assertIs(Tokenizer(self.config_path).table, table)
+        self.assertIs(Tokenizer(self.config_path, "regex").table, table)
+        inliner = Inliner(self.config_path, "sample.vl", cache_dir=os.path.join(self.dir, "cache"))
+        self.assertIs(inliner.tokenizer.table, table)
+        self.assertIs(inliner.keywords, table.keywords)
+        self.assertEqual(inliner._config_digest, table.digest)
+
+    def test_immutable(self):
+        table = load_lexer_table(self.config_path)
+        with self.assertRaises(AttributeError):
+            table.keywords = frozenset()
+        with self.assertRaises(AttributeError):
+            del table.operators
+        with self.assertRaises(TypeError):
+            table.binary_token_pairs["="] = frozenset()
+
+    def test_reloaded_when_config_changes(self):
+        table = load_lexer_table(self.config_path)
+        with open(self.config_path) as f:
+            config_data = json.load(f)
+        config_data["keywords"].append("extra_keyword")
+        with open(self.config_path, "w") as f:
+            json.dump(config_data, f)
+        changed = load_lexer_table(self.config_path)
+        self.assertIsNot(changed, table)
+        self.assertIn("extra_keyword", changed.keywords)
+        self.assertNotEqual(changed.digest, table.digest)
+
+    def test_engines_agree(self):
+        with open("sample.vl") as f:
+            text = f.read()
+        self.assertEqual(Tokenizer(self.config_path, "char").tokenize(text), Tokenizer(self.config_path, "regex").tokenize(text))
+
+if __name__ == "__main__":
+    unittest.main()
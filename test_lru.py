@@ -0,0 +1,28 @@
+import unittest
+from lru import LRUCache
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_eviction_order(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(1, cache.get("a")) # "b" is now the least recently used
+        cache.put("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertIn("a", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(2, len(cache))
+
+    def test_statistics(self):
+        cache = LRUCache(8)
+        self.assertIsNone(cache.get("x"))
+        cache.put("x", 0)
+        self.assertEqual(0, cache.get("x", "missing"))
+        self.assertEqual((1, 1, 8, 1), tuple(cache.info()))
+        cache.clear()
+        self.assertEqual((0, 0, 8, 0), tuple(cache.info()))
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            LRUCache(0)
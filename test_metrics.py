@@ -0,0 +1,52 @@
+import json
+import os
+import tempfile
+import unittest
+from inliner import Inliner
+from metrics import InlineMetrics, flattened_length
+
+class TestInlineMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.phases = []
+        self.inliner = Inliner("config.json", "sample.vl")
+        self.inliner.inline(message=False, tops=["top"], callback=lambda name, metrics: self.phases.append(name))
+        self.metrics = self.inliner.metrics
+
+    def test_callback(self):
+        self.assertEqual(["index", "reference_tree", "closure", "estimate", "inline"], self.phases)
+        for name in self.phases:
+            self.assertGreaterEqual(self.metrics.phases[name]["wall_seconds"], 0)
+
+    def test_module_metrics(self):
+        self.assertEqual(["adder", "flop", "alu", "top"], list(self.metrics.modules))
+        self.assertEqual(2, self.metrics.modules["alu"]["instances"])
+        self.assertEqual(1, self.metrics.modules["top"]["instances"])
+        self.assertEqual(0, self.metrics.modules["adder"]["instances"])
+        for name, mod in self.inliner._inlined_modules.items():
+            self.assertEqual(len(list(mod.header)) + len(list(mod.body)), self.metrics.modules[name]["output_tokens"])
+        self.assertEqual(4, self.metrics.totals["inlined_modules"])
+        self.assertEqual(3, self.metrics.totals["instances"])
+
+    def test_flattened_length(self):
+        lengths = {}
+        body = self.inliner._inlined_modules["top"].body
+        self.assertEqual(len(list(body)), flattened_length(body, lengths))
+        self.assertEqual(len(self.inliner.modules["adder"].body), flattened_length(self.inliner.modules["adder"].body, lengths))
+
+    def test_report(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            self.metrics.write(path)
+            with open(path) as f:
+                report = json.load(f)
+        finally:
+            os.unlink(path)
+        self.assertEqual(self.metrics.to_dict(), report)
+
+    def test_phase_without_callback(self):
+        metrics = InlineMetrics()
+        with metrics.phase("write"):
+            pass
+        self.assertEqual({"wall_seconds", "cpu_seconds", "peak_rss_kb"}, set(metrics.phases["write"]))
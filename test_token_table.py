@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from tokenizer import Tokenizer
+from token_table import TokenTable, ByteTokenTable
+from inliner import Inliner
+
+class TestTokenTable(unittest.TestCase):
+
+    def setUp(self):
+        self.t = Tokenizer("config.json")
+        self.text = "module m(a); // c\n  assign a = \"s\";\nendmodule\n"
+        self.tokens = self.t.tokenize(self.text)
+        self.table = self.t.tokenize_table(self.text)
+
+    def as_pairs(self, tokens):
+        return [(x.content, x.token_type) for x in tokens]
+
+    def test_matches_token_list(self):
+        self.assertEqual(len(self.tokens), len(self.table))
+        self.assertEqual(self.as_pairs(self.tokens), self.as_pairs(self.table))
+        for i in range(len(self.tokens)):
+            self.assertEqual(self.tokens[i].content, self.table.content(i))
+            self.assertEqual(self.tokens[i].token_type, self.table.token_type(i))
+        self.assertEqual(self.text, self.table.text())
+
+    def test_slices_are_views(self):
+        view = self.table[3:-2]
+        self.assertIs(view.types, self.table.types)
+        self.assertEqual(self.as_pairs(self.tokens[3:-2]), self.as_pairs(view))
+        self.assertEqual(self.as_pairs(self.tokens[3:-2][1:4]), self.as_pairs(view[1:4]))
+        self.assertEqual(self.tokens[-3].content, view[-1].content)
+        self.assertEqual("".join([x.content for x in self.tokens[3:-2]]), view.text())
+        self.assertEqual(0, len(self.table[5:2]))
+        self.assertEqual("", self.table[5:2].text())
+        with self.assertRaises(IndexError):
+            view[len(view)]
+
+    def test_from_tokens_without_source(self):
+        table = TokenTable.from_tokens(self.tokens)
+        self.assertEqual(self.text, table.source)
+        self.assertEqual(self.as_pairs(self.tokens), self.as_pairs(table))
+        with self.assertRaises(ValueError):
+            TokenTable.from_tokens(self.tokens, self.text + " ")
+
+    def test_byte_table_matches_token_list(self):
+        text = self.text.replace("\"s\"", "\"\u00e9\" \"t\"")
+        table = self.t.tokenize_bytes(text.encode("utf-8"))
+        self.assertIsInstance(table, ByteTokenTable)
+        self.assertEqual(self.as_pairs(self.t.tokenize(text)), self.as_pairs(table))
+        self.assertEqual(text, table.text())
+        view = table[3:-2]
+        self.assertIsInstance(view, ByteTokenTable)
+        self.assertEqual(self.as_pairs(view), self.as_pairs(TokenTable.from_bytes(view.to_bytes())))
+
+    def test_compact_index_matches_default(self, path="sample.vl", mapped=False):
+        default = Inliner("config.json", path)
+        default._index()
+        compact = Inliner("config.json", path, compact=True, mapped=mapped)
+        compact._index()
+        self.assertEqual(list(default.modules), list(compact.modules))
+        for name, mod in default.modules.items():
+            other = compact.modules[name]
+            self.assertIsInstance(other.body, TokenTable)
+            self.assertEqual(self.as_pairs(mod.header), self.as_pairs(other.header))
+            self.assertEqual(self.as_pairs(mod.body), self.as_pairs(other.body))
+            self.assertEqual(mod.ports, other.ports)
+            self.assertEqual(mod.parameters, other.parameters)
+            self.assertEqual("".join([x.content for x in mod.body]), other.body.text())
+
+    def test_mapped_index_matches_default(self):
+        self.test_compact_index_matches_default(mapped=True)
+
+    def test_mapped_index_of_crlf_file(self):
+        # Text mode reads "\r\n" as "\n", so a memory-mapped file must be read the same way
+        with open("sample.vl") as f:
+            text = f.read() + "module c(a); /* x\n y */ // z\n  input a;\nendmodule\n"
+        fd, path = tempfile.mkstemp(suffix=".v")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(text.replace("\n", "\r\n").encode("utf-8"))
+            self.test_compact_index_matches_default(path, mapped=True)
+        finally:
+            os.unlink(path)
+        table = self.t.tokenize_bytes(self.text.replace("\n", "\r\n").encode("utf-8"))
+        self.assertEqual(self.as_pairs(self.tokens), self.as_pairs(table))
+        self.assertEqual(self.text, table.text())
@@ -1,7 +1,16 @@
 import unittest
+import contextlib
+import copy
+import io
+import json
+import os
+import random
+import shutil
 import traceback
 import sys
+import tempfile
 from tokenizer import *
+from lru import LRUCache
 
 
 class TestTokenizer(unittest.TestCase):
@@ -24,4 +33,77 @@ class TestTokenizer(unittest.TestCase):
             tokens = self.t.tokenize(s)
             s2 = "".join([x.to_string() for x in tokens])
             self.assertEqual(s,s2)
-                
\ No newline at end of file
+                
+    def test_tokenize_stream_chunk_boundaries(self):
+        s = "module m(a, b); // line comment\n/* block\n comment */ assign a = ~&b;\n$display(\"a \\\" b\"); `define X 4'b10_z1\nendmodule\n"
+        expected = [(x.content, x.token_type) for x in self.t.tokenize(s)]
+        for size in (1, 2, 3, 7, len(s)):
+            chunks = [s[i:i+size] for i in range(0, len(s), size)]
+            streamed = [(x.content, x.token_type) for x in self.t.tokenize_stream(chunks)]
+            self.assertEqual(expected, streamed)
+
+    def assert_engines_match(self, r, s):
+        expected = [(x.content, x.token_type) for x in self.t.tokenize(s)]
+        self.assertEqual(expected, [(x.content, x.token_type) for x in r.tokenize(s)], s)
+        for size in (1, 5):
+            chunks = [s[i:i+size] for i in range(0, len(s), size)]
+            self.assertEqual(expected, [(x.content, x.token_type) for x in r.tokenize_stream(chunks)], s)
+        self.assertEqual(expected, [(x.content, x.token_type) for x in r.tokenize_bytes(s.encode("utf-8"))], s)
+
+    def test_regex_engine_matches_char_engine(self, path="sample.vl"):
+        with open(path,"r") as f:
+            corpus = [f.read()]
+        corpus.extend(["a == b <= c", "x = \"s\" \"t\"", "/*/ a */b", "/**/ a*/b", "\"unterminated", "/* unterminated",
+            "q\"a\\\\\"b\" \"\"", "//\n// x", "1.5e3 4'hF_z ? `define X $display",
+            # A string or an unterminated string right after a block comment, and comments ending the input
+            "$display(/*x*/\"a b\");", "/*x*/\"a // b", "a\xa0b\u3000c\x1fd", "/**/\"+-", "a/*/", "/*/", "a /*x*/", "//x"])
+        # Random inputs over the characters which delimit the lexemes
+        alphabet = ["a", "b1", " ", "\n", "\t", "\"", "\\", "/", "*", "`", "$", "(", ";", "<", "=", "!", "~", "&", "'", ".", "é", "©",
+            "\x1c", "\xa0", "\u2003",
+            "/*", "*/", "//", "\\\"", "/*/", "<<<", "===", "4'hF", "1.5e3", "module", "$display", "`define"]
+        rng = random.Random(0)
+        corpus.extend("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 30))) for _ in range(3000))
+        r = Tokenizer("config.json", "regex")
+        with contextlib.redirect_stdout(io.StringIO()): # Warnings of the lexemes classified DEFAULT
+            for s in corpus:
+                self.assert_engines_match(r, s)
+
+    def test_classification_cache(self):
+        self.assertIs(self.t.cache, Tokenizer("config.json", "regex").cache)
+        for engine in Tokenizer.engines:
+            cache = LRUCache(3)
+            t = Tokenizer("config.json", engine, cache)
+            tokens = t.tokenize("wire w; wire w;")
+            self.assertEqual([TokenType.KEYWORD, TokenType.IDENTIFIER], [tokens[0].token_type, tokens[2].token_type])
+            info = t.cache_info()
+            self.assertEqual(3, info.maxsize)
+            self.assertLessEqual(info.currsize, 3)
+            self.assertGreater(info.hits, 0)
+            hits = info.hits
+            Tokenizer("config.json", engine, cache).tokenize("wire w;")
+            self.assertGreater(t.cache_info().hits, hits)
+
+    def test_classification_cache_follows_config(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "config.json")
+            with open("config.json") as f:
+                config_data = json.load(f)
+            with open(path, "w") as f:
+                json.dump(config_data, f)
+            self.assertEqual(TokenType.IDENTIFIER, Tokenizer(path).tokenize("extra_keyword")[0].token_type)
+            config_data["keywords"].append("extra_keyword")
+            with open(path, "w") as f:
+                json.dump(config_data, f)
+            # Make the change visible even if the file is rewritten within the timestamp resolution
+            os.utime(path, ns=(1, 1))
+            self.assertEqual(TokenType.KEYWORD, Tokenizer(path).tokenize("extra_keyword")[0].token_type)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_tokens_are_immutable(self):
+        token = self.t.tokenize("wire")[0]
+        with self.assertRaises(AttributeError):
+            token.content = "reg"
+        self.assertIs(token, copy.copy(token))
+        self.assertIs(token, copy.deepcopy([token])[0])
@@ -0,0 +1,198 @@
+from array import array
+import struct
+from tokens import Token, TokenType
+
+TOKEN_TYPES = list(TokenType) # Maps the value of a TokenType (its type code) back to the enum member
+
+_MAGIC = b"TKT1" # Leading bytes of a serialized TokenTable
+_BYTE_MAGIC = b"TKB1" # Leading bytes of a serialized ByteTokenTable, whose offsets count bytes
+_HEADER = struct.Struct("<4scQQ") # magic, offset typecode, token count, byte length of the source text
+
+class TokenTable:
+    ''' A compact, struct-of-arrays store for a sequence of tokens lexed from one source text.
+        Rather than one Token object per lexeme, the table keeps the type codes in an
+        array('B') and the start/end offsets of every token into the source text in two
+        integer arrays. Token objects and their content are only materialized when they
+        are requested.
+
+        A TokenTable behaves like a read-only list of Token: it supports len(), iteration,
+        indexing, and slicing. Slices are views sharing the arrays of the original table.
+    '''
+
+    _magic = _MAGIC # Leading bytes of the output of to_bytes
+
+    def __init__(self, source, types, starts, ends, lo=0, hi=None):
+        ''' The constructor
+            Params:
+                source (str) : the text the offsets refer to
+                types (array of int) : TokenType values of the tokens
+                starts, ends (array of int) : offsets of the tokens into source
+                lo, hi (int) : bounds of the view over the arrays
+        '''
+        self.source = source
+        self.types = types
+        self.starts = starts
+        self.ends = ends
+        self.lo = lo
+        self.hi = len(types) if hi is None else hi
+
+    @classmethod
+    def from_tokens(cls, tokens, source=None):
+        ''' Builds a table from an iterable of Token.
+            Params:
+                tokens (iterable of Token)
+                source (str) : the text the tokens were lexed from; if not given it is
+                    rebuilt by concatenating the tokens
+            Returns: TokenTable
+        '''
+        if source is None:
+            tokens = list(tokens)
+            source = "".join([x.content for x in tokens])
+        offset_code = "I" if len(source) <= 0xFFFFFFFF else "Q"
+        types = array("B")
+        starts = array(offset_code)
+        ends = array(offset_code)
+        pos = 0
+        for token in tokens:
+            types.append(token.token_type.value)
+            starts.append(pos)
+            pos += len(token.content)
+            ends.append(pos)
+        if pos != len(source):
+            raise ValueError("Tokens passed to TokenTable.from_tokens do not cover the source text")
+        return cls(source, types, starts, ends)
+
+    def to_bytes(self):
+        ''' Serializes the tokens of the view into a compact binary string (see from_bytes).
+            The arrays are written in the native byte order, so the result is meant
+            to be read back on the same kind of machine (caches, worker processes)
+        '''
+        base = self.starts[self.lo] if self.hi > self.lo else 0
+        offset_code = self.starts.typecode
+        starts = array(offset_code, [x - base for x in self.starts[self.lo:self.hi]])
+        ends = array(offset_code, [x - base for x in self.ends[self.lo:self.hi]])
+        source = self._encoded_text()
+        return b"".join([_HEADER.pack(self._magic, offset_code.encode(), len(self), len(source)),
+            self.types[self.lo:self.hi].tobytes(), starts.tobytes(), ends.tobytes(), source])
+
+    @classmethod
+    def from_bytes(cls, data):
+        ''' Rebuilds a TokenTable from the output of to_bytes()
+            Params: data (bytes)
+            Returns: TokenTable, or ByteTokenTable if data holds one
+        '''
+        magic, offset_code, count, source_length = _HEADER.unpack_from(data)
+        if magic != _MAGIC and magic != _BYTE_MAGIC:
+            raise ValueError("Data passed to TokenTable.from_bytes is not a serialized TokenTable")
+        offset_code = offset_code.decode()
+        pos = _HEADER.size
+        types = array("B")
+        types.frombytes(data[pos:pos + count])
+        pos += count
+        offsets = []
+        for _ in range(2):
+            a = array(offset_code)
+            a.frombytes(data[pos:pos + count * a.itemsize])
+            pos += count * a.itemsize
+            offsets.append(a)
+        if len(data) - pos != source_length:
+            raise ValueError("Serialized TokenTable passed to TokenTable.from_bytes is truncated")
+        if magic == _BYTE_MAGIC:
+            return ByteTokenTable(data[pos:], types, offsets[0], offsets[1])
+        return TokenTable(data[pos:].decode("utf-8"), types, offsets[0], offsets[1])
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def __iter__(self):
+        source = self.source
+        types = self.types
+        starts = self.starts
+        ends = self.ends
+        for i in range(self.lo, self.hi):
+            yield Token(source[starts[i]:ends[i]], TOKEN_TYPES[types[i]])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("TokenTable slices do not support a step")
+            return type(self)(self.source, self.types, self.starts, self.ends, self.lo + start, self.lo + max(start, stop))
+        i = self._index(key)
+        return Token(self.source[self.starts[i]:self.ends[i]], TOKEN_TYPES[self.types[i]])
+
+    def _index(self, key):
+        ''' Converts an index into the view to an index into the arrays '''
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("TokenTable index out of range")
+        return self.lo + key
+
+    def content(self, key):
+        ''' Returns the text of the token at index key without building a Token '''
+        i = self._index(key)
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def token_type(self, key):
+        ''' Returns the TokenType of the token at index key without building a Token '''
+        return TOKEN_TYPES[self.types[self._index(key)]]
+
+    def text(self):
+        ''' Returns the concatenated text of the tokens in the view '''
+        if self.hi <= self.lo:
+            return ""
+        return self.source[self.starts[self.lo]:self.ends[self.hi - 1]]
+
+    def _encoded_text(self):
+        ''' Returns the concatenated text of the tokens in the view, encoded in UTF-8 '''
+        return self.text().encode("utf-8")
+
+
+class ByteTokenTable(TokenTable):
+    ''' A TokenTable whose source is UTF-8 encoded bytes, or a buffer such as an mmap of
+        a file, rather than a str. The offsets are byte offsets, and the text of a token
+        is only decoded when its content is requested, so a table over a mapped file
+        costs little more than its arrays. As in a file read in text mode, the decoded
+        text has "\\n" line ends where the source has "\\r\\n".
+    '''
+
+    _magic = _BYTE_MAGIC
+
+    def __iter__(self):
+        source = self.source
+        types = self.types
+        starts = self.starts
+        ends = self.ends
+        for i in range(self.lo, self.hi):
+            yield Token(_decode(source[starts[i]:ends[i]]), TOKEN_TYPES[types[i]])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return TokenTable.__getitem__(self, key)
+        i = self._index(key)
+        return Token(_decode(self.source[self.starts[i]:self.ends[i]]), TOKEN_TYPES[self.types[i]])
+
+    def content(self, key):
+        i = self._index(key)
+        return _decode(self.source[self.starts[i]:self.ends[i]])
+
+    def text(self):
+        return _decode(self._encoded_text())
+
+    def _encoded_text(self):
+        if self.hi <= self.lo:
+            return b""
+        return bytes(self.source[self.starts[self.lo]:self.ends[self.hi - 1]])
+
+
+def _decode(data):
+    ''' Decodes UTF-8 encoded bytes, reading "\\r\\n" line ends as "\\n" like a file opened in text mode '''
+    return data.decode("utf-8").replace("\r\n", "\n")
+
+
+def join_tokens(tokens):
+    ''' Returns the concatenated text of tokens (List of Token or TokenTable) '''
+    if isinstance(tokens, TokenTable):
+        return tokens.text()
+    return "".join([x.content for x in tokens])
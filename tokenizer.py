@@ -1,129 +1,198 @@
-import json
 from tokens import Token, TokenType
 import regexes
+from scanner import RegexScanner
+from lexer_table import load_lexer_table
+from token_table import TokenTable
+from lru import LRUCache
+
+DEFAULT_CACHE_SIZE = 1 << 16 # Number of lexemes remembered by a classification cache
+
+_shared_caches = {} # Maps the digest of a configuration to the classification cache of its Tokenizers
+
+def shared_cache(config_path, maxsize=DEFAULT_CACHE_SIZE):
+    ''' Returns the lexeme classification cache (LRUCache mapping str to TokenType) shared
+        by every Tokenizer in the process which uses the configuration in config_path.
+        The cache follows the contents of the file, so a Tokenizer created after the file
+        changes does not reuse classifications made with the old configuration.
+        maxsize only applies when the cache does not exist yet.
+    '''
+    key = load_lexer_table(config_path).digest
+    if key not in _shared_caches:
+        _shared_caches[key] = LRUCache(maxsize)
+    return _shared_caches[key]
 
 class Tokenizer:
 
-    def __init__(self, config_path):
+    engines = ("char", "regex") # Available lexer backends
+
+    def __init__(self, config_path, engine="char", cache=None):
+        ''' The constructor
+            Params:
+                config_path (str) : path of the configuration file (config.json)
+                engine (str) : the lexer backend; "char" walks the input one character at
+                    a time, "regex" uses a RegexScanner built from the configuration
+                cache (LRUCache) : the lexeme classification cache; defaults to the one
+                    shared by all Tokenizers using config_path
+        '''
+        if engine not in self.engines:
+            raise ValueError(f"Unknown lexer engine \"{engine}\"; expected one of {', '.join(self.engines)}")
         self.config_path = config_path
-        with open(self.config_path) as f:
-            config_data = json.load(f)
-            self.operators = config_data["operators"]
-            self.keywords = config_data["keywords"]
-            # Dictionary storing special 2 character tokens in a mapping such that:
-            # <key> = second character
-            # <value> = list of all possbile first characters
-            # Ex: "~^" is represented as '^' -> ['~']
-            # while "~&" and "&&" are "&" -> ['~', '&']
-            self.binary_token_pairs = config_data["binary_token_pairs"]
-            self.ternary_token_pairs = config_data["ternary_token_pairs"]
+        self.engine = engine
+        self.table = load_lexer_table(config_path) # Precompiled tables of the configuration, shared process-wide
+        self.operators = self.table.operators
+        self.keywords = self.table.keywords
+        # Mappings storing special 2 character tokens such that:
+        # <key> = second character
+        # <value> = set of all possbile first characters
+        # Ex: "~^" is represented as '^' -> {'~'}
+        # while "~&" and "&&" are "&" -> {'~', '&'}
+        self.binary_token_pairs = self.table.binary_token_pairs
+        self.ternary_token_pairs = self.table.ternary_token_pairs
+        self.cache = cache if cache is not None else shared_cache(config_path)
+        self._scanner = None
+        if engine == "regex":
+            self._scanner = self._regex_scanner()
+        self._byte_scanner = None # Scanner of tokenize_bytes, built on first use
         
     def tokenize(self, line):
         ''' Takes a string and tokenizes it according to verilog syntax '''
+        return list(self.tokenize_stream((line,)))
+
+    def tokenize_stream(self, chunks):
+        ''' Takes an iterable of strings (e.g. successive chunks read from a file)
+            and lazily yields the tokens of their concatenation one at a time.
+            The lexer state is carried from one chunk to the next, so tokens
+            spanning a chunk boundary are produced exactly as if the whole text
+            had been passed to tokenize()
+            Params: chunks (iterable of str)
+            Returns: generator of Token
+        '''
+        if self._scanner:
+            return self._scanner.tokenize_stream(chunks)
+        return self._char_stream(chunks)
+
+    def tokenize_table(self, text):
+        ''' Takes a string and tokenizes it into a compact TokenTable referencing it
+            Params: text (str)
+            Returns: TokenTable
+        '''
+        return TokenTable.from_tokens(self.tokenize_stream((text,)), text)
+
+    def tokenize_bytes(self, data):
+        ''' Takes UTF-8 encoded text and tokenizes it in place into a ByteTokenTable referencing
+            it (see RegexScanner.tokenize_bytes). The engines produce the same tokens, which
+            test_tokenizer checks on random inputs, so the regex engine is used whatever the
+            engine of the Tokenizer.
+            Params: data (bytes, or a buffer such as an mmap)
+            Returns: ByteTokenTable
+        '''
+        if self._byte_scanner is None:
+            self._byte_scanner = self._scanner or self._regex_scanner()
+        return self._byte_scanner.tokenize_bytes(data)
+
+    def _regex_scanner(self):
+        ''' Returns a RegexScanner built from the lexer table '''
+        return RegexScanner(self.operators, self.keywords, self.binary_token_pairs, self.ternary_token_pairs, self._classify,
+            self.cache, self.table.operator_lexemes)
+
+    def _char_stream(self, chunks):
+        ''' The character engine behind tokenize_stream() '''
         buffer = ""
-        tokens = []
         in_string = False
         in_comment = False
         in_block_comment = False
         # TODO: Add an elif clause to identify '`' as the start of a compiler directive
-        for c in line:
-            # Comment processings
-            if in_comment:
-                if c == "\n":
-                    in_comment = False
-                    t = Token(buffer, TokenType.COMMENT)
-                    tokens.append(t)
-                    tokens.append( Token(c, TokenType.WHTSPC) )
-                    buffer = ""
-                else:
-                    buffer += c
-            elif buffer == "//":
-                if c != "\n":
-                    in_comment = True
-                    buffer += c
-                else:
-                    in_comment = False
-                    t = Token(buffer, TokenType.COMMENT)
-                    tokens.append(t)
-                    tokens.append( Token(c, TokenType.WHTSPC) )
-                    buffer = ""
-            elif in_block_comment:
-                if buffer[-2:] == "*/":
+        for chunk in chunks:
+            for c in chunk:
+                if in_block_comment and buffer[-2:] == "*/":
+                    # The block comment ended with the previous character; c starts a new token
                     in_block_comment = False
-                    t = Token(buffer, TokenType.COMMENT)
-                    tokens.append(t)
-                    if c.isspace():
-                        tokens.append( Token(c, TokenType.WHTSPC) )
+                    yield Token(buffer, TokenType.COMMENT)
+                    buffer = ""
+                # Comment processings
+                if in_comment:
+                    if c == "\n":
+                        in_comment = False
+                        yield Token(buffer, TokenType.COMMENT)
+                        yield Token(c, TokenType.WHTSPC)
                         buffer = ""
-                    else:
-                        buffer = c
-                else:
-                    buffer += c
-            elif buffer == "/*":
-                in_block_comment = True
-                buffer += c
-            elif c == "\"":
-                if buffer and buffer[-1] == "\\" and in_string:
-                    # The escape character '\"'
-                    buffer += c
-                else:
-                    in_string = not in_string
-                    if in_string:
-                        t = Token(buffer, self.select_type(buffer))
-                        tokens.append(t)
-                        buffer = c
                     else:
                         buffer += c
-                        t = Token(buffer,TokenType.STRING)
-                        tokens.append(t)
-                        buffer = ""
-            elif in_string:
-                buffer += c
-            elif c.isspace():
-                t = Token(buffer, self.select_type(buffer))
-                tokens = self.append_non_empty(tokens,t)
-                tokens.append( Token(c, TokenType.WHTSPC) )
-                buffer = ""
-            elif c in self.operators:
-                # This catches operators as well as special comment characters like / and *
-                if c in self.ternary_token_pairs:
-                    # c is an operators which can appear in groups of 3
-                    if buffer in self.ternary_token_pairs[c]:
-                        # The token preceding c combines with it to make a new operator (ex: "<<<" =  "<" + "<<")
+                elif buffer == "//":
+                    if c != "\n":
+                        in_comment = True
                         buffer += c
                     else:
-                        # The token before c is not an operator we can combine with it 
-                        t = Token(buffer, self.select_type(buffer))
-                        tokens = self.append_non_empty(tokens,t)
-                        buffer = c
-                elif c in self.binary_token_pairs:
-                    # c is an operator which can appear by itself or with others
-                    if buffer in self.binary_token_pairs[c]:
-                        # The token preceding c combines with it to make a new operator (ex: "!=" =  "!" + "=")
+                        in_comment = False
+                        yield Token(buffer, TokenType.COMMENT)
+                        yield Token(c, TokenType.WHTSPC)
+                        buffer = ""
+                elif in_block_comment:
+                    buffer += c
+                elif buffer == "/*":
+                    in_block_comment = True
+                    buffer += c
+                elif c == "\"":
+                    if buffer and buffer[-1] == "\\" and in_string:
+                        # The escape character '\"'
                         buffer += c
                     else:
-                        # The token before c is not an operator we can combine with it 
-                        t = Token(buffer, self.select_type(buffer))
-                        tokens = self.append_non_empty(tokens,t)
+                        in_string = not in_string
+                        if in_string:
+                            yield Token(buffer, self.select_type(buffer))
+                            buffer = c
+                        else:
+                            buffer += c
+                            yield Token(buffer,TokenType.STRING)
+                            buffer = ""
+                elif in_string:
+                    buffer += c
+                elif c.isspace():
+                    if buffer:
+                        yield Token(buffer, self.select_type(buffer))
+                    yield Token(c, TokenType.WHTSPC)
+                    buffer = ""
+                elif c in self.operators:
+                    # This catches operators as well as special comment characters like / and *
+                    if c in self.ternary_token_pairs:
+                        # c is an operators which can appear in groups of 3
+                        if buffer in self.ternary_token_pairs[c]:
+                            # The token preceding c combines with it to make a new operator (ex: "<<<" =  "<" + "<<")
+                            buffer += c
+                        else:
+                            # The token before c is not an operator we can combine with it 
+                            if buffer:
+                                yield Token(buffer, self.select_type(buffer))
+                            buffer = c
+                    elif c in self.binary_token_pairs:
+                        # c is an operator which can appear by itself or with others
+                        if buffer in self.binary_token_pairs[c]:
+                            # The token preceding c combines with it to make a new operator (ex: "!=" =  "!" + "=")
+                            buffer += c
+                        else:
+                            # The token before c is not an operator we can combine with it 
+                            if buffer:
+                                yield Token(buffer, self.select_type(buffer))
+                            buffer = c
+                    else:
+                        if buffer:
+                            yield Token(buffer, self.select_type(buffer))
                         buffer = c
-                else:
-                    t = Token(buffer, self.select_type(buffer))
-                    tokens = self.append_non_empty(tokens,t)
+                elif buffer in self.operators:
+                    yield Token(buffer, TokenType.OPERATOR)
                     buffer = c
-            elif buffer in self.operators:
-                t = Token(buffer, TokenType.OPERATOR)
-                tokens = self.append_non_empty(tokens,t)
-                buffer = c
-            elif c == "`":
-                # Catches the start of compiler directives, for which '`' is reserved
-                t = Token(buffer, self.select_type(buffer))
-                tokens = self.append_non_empty(tokens,t)
-                buffer = c
-            else:
-                buffer += c
-        t = Token(buffer, self.select_type(buffer))
-        tokens = self.append_non_empty(tokens,t)
-        return tokens
+                elif c == "`":
+                    # Catches the start of compiler directives, for which '`' is reserved
+                    if buffer:
+                        yield Token(buffer, self.select_type(buffer))
+                    buffer = c
+                else:
+                    buffer += c
+        if in_block_comment and buffer[-2:] == "*/":
+            # A comment ending the input, including "/*/", which the lexer closes like "/**/"
+            yield Token(buffer, TokenType.COMMENT)
+        elif buffer:
+            yield Token(buffer, self.select_type(buffer))
 
     def append_non_empty(self, tokens, token):
         ''' Appends the string token only if it is not empty 
@@ -139,6 +208,22 @@ class Tokenizer:
             Params: content (str)
             Returns: TokenType
         '''
+        token_type = self.cache.get(content)
+        if token_type is None:
+            token_type = self._classify(content)
+            self.cache.put(content, token_type)
+        return token_type
+
+    def cache_info(self):
+        ''' Returns the hit/miss statistics of the classification cache as a
+            CacheInfo(hits, misses, maxsize, currsize)
+        '''
+        return self.cache.info()
+
+    def _classify(self, content):
+        ''' Classifies content with the keyword/operator lists and the regexes of
+            regexes.py, without consulting the cache (see select_type)
+        '''
         # TODO: Add a function to identify a valid keyword according to the IEEE language standard
         # https://ieeexplore.ieee.org/stamp/stamp.jsp?arnumber=1620780
         if self.is_keyword(content):
@@ -1,3 +1,4 @@
+from collections import namedtuple
 import enum
 
 class TokenType(enum.Enum):
@@ -13,17 +14,22 @@ class TokenType(enum.Enum):
     DEFAULT = 9 # Used for detecting errors during debugging
     EMPTY_STRING = 10 # Used for detecting errors during debugging
 
-class Token:
-    ''' The wrapper class for raw verilog tokens '''
+class Token(namedtuple("Token", ["content", "token_type"])):
+    ''' The wrapper class for raw verilog tokens
+        Fields:
+            content (str) : the character content of the token
+            token_type (TokenType) : one of the values on the enum token_type 
+        Tokens are immutable, so one token may be shared by any number of token lists
+        and copying a token returns the token itself. A token with another content,
+        such as a renamed identifier, is a new Token.
+    '''
+    __slots__ = ()
 
-    def __init__(self,content,token_type):
-        ''' The constructor
-            Params:
-                content (str) : the character content of the token
-                token_type (TokenType) : one of the values on the enum token_type 
-        '''
-        self.content = content
-        self.token_type = token_type
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def info(self):
         return f"type: <{self.token_type}>, content: <{self.content}>"